@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Mix narration with a background music bed, entirely on NumPy arrays.
+
+- Picks ONE random track from music/ (wav or mp3); without one, the
+  narration passes through the limiter alone.
+- Loops or trims the bed to the narration length (resampled to 44.1 kHz).
+- Sidechain ducking: an attack/release envelope follower on the voice drives
+  the bed's gain down while someone is speaking.
+- Fades the bed in/out, sums, runs a peak limiter and writes one WAV
+  (atomic write) in a single pass.
+
+Envelopes are computed per 5 ms block and interpolated back to sample rate,
+so the only Python-level loop runs over a few thousand blocks, not samples.
+
+Usage:
+    python audio_mix.py                                  # narration.wav → final_audio.wav
+    python audio_mix.py --narration a.wav --output b.wav --music-dir music/
+"""
+
+import argparse
+import os
+import random
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import perf_trace
+
+# ---------------- CONFIG ----------------
+NARRATION_FILE = "narration.wav"
+OUTPUT_FILE = "final_audio.wav"
+MUSIC_DIR = "music"
+
+SAMPLE_RATE = 44100
+BLOCK_MS = 5.0
+
+MUSIC_GAIN_DB = -18.0     # bed level with no voice
+DUCK_DB = -12.0           # extra attenuation at full voice
+VOICE_THRESHOLD_DB = -45.0
+VOICE_RANGE_DB = 20.0     # ducking ramps in over this range above threshold
+ATTACK_MS = 20.0
+RELEASE_MS = 400.0
+
+FADE_IN_MS = 800.0
+FADE_OUT_MS = 1500.0
+
+LIMIT_DB = -1.0
+LIMIT_RELEASE_MS = 80.0
+# ----------------------------------------
+
+
+def log(msg: str) -> None:
+    print(f"[MIX] {msg}", flush=True)
+
+
+def db_to_gain(db) -> np.ndarray:
+    return np.power(10.0, np.asarray(db, dtype=np.float64) / 20.0)
+
+
+# ------------------------- I/O ------------------------- #
+
+def read_wav(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a PCM WAV as mono float32 in [-1, 1].
+    """
+    with wave.open(path, "rb") as w:
+        channels = w.getnchannels()
+        width = w.getsampwidth()
+        sr = w.getframerate()
+        raw = w.readframes(w.getnframes())
+
+    if width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        v = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        v = np.where(v >= 1 << 23, v - (1 << 24), v)
+        x = v.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise SystemExit(f"[MIX] Unsupported sample width {width} in {path}")
+
+    if channels > 1:
+        x = x.reshape(-1, channels).mean(axis=1)
+    return x, sr
+
+
+def read_with_pydub(path: str) -> Tuple[np.ndarray, int]:
+    from pydub import AudioSegment
+
+    seg = AudioSegment.from_file(path).set_channels(1)
+    x = np.array(seg.get_array_of_samples(), dtype=np.float32)
+    return x / float(1 << (8 * seg.sample_width - 1)), seg.frame_rate
+
+
+def read_audio(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a music bed of any format as mono float32. Plain PCM WAVs take the
+    fast stdlib path; anything `wave` rejects (IEEE float, and on Python 3.10
+    WAVE_FORMAT_EXTENSIBLE) goes through pydub/ffmpeg like mp3 does.
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            return read_wav(path)
+        except (wave.Error, EOFError):
+            pass
+
+    return read_with_pydub(path)
+
+
+def write_wav(path: str, x: np.ndarray, sr: int) -> None:
+    pcm = np.clip(np.round(x * 32767.0), -32768, 32767).astype("<i2")
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with wave.open(tmp, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    os.replace(tmp, path)
+
+
+def find_music_files(music_dir: str = MUSIC_DIR) -> List[str]:
+    if not os.path.isdir(music_dir):
+        return []
+    return sorted(
+        os.path.join(music_dir, f)
+        for f in os.listdir(music_dir)
+        if f.lower().endswith((".wav", ".mp3"))
+    )
+
+
+# ------------------------- DSP ------------------------- #
+
+def resample(x: np.ndarray, sr_from: int, sr_to: int) -> np.ndarray:
+    if sr_from == sr_to or len(x) == 0:
+        return x
+    n = int(round(len(x) * sr_to / sr_from))
+    t = np.arange(n, dtype=np.float64) * (sr_from / sr_to)
+    return np.interp(t, np.arange(len(x)), x).astype(np.float32)
+
+
+def fit_length(x: np.ndarray, n: int) -> np.ndarray:
+    """
+    Loop (tile) or trim `x` to exactly `n` samples.
+    """
+    if len(x) == 0:
+        return np.zeros(n, dtype=np.float32)
+    return np.resize(x, n)
+
+
+def block_peaks(x: np.ndarray, block: int) -> np.ndarray:
+    nb = -(-len(x) // block)
+    padded = np.zeros(nb * block, dtype=np.float32)
+    padded[:len(x)] = np.abs(x)
+    return padded.reshape(nb, block).max(axis=1)
+
+
+def smooth(env: np.ndarray, attack: float, release: float) -> np.ndarray:
+    """
+    One-pole attack/release follower over block values. `attack` and
+    `release` are per-block smoothing coefficients in [0, 1).
+    """
+    out = np.empty_like(env)
+    y = 0.0
+    for i, v in enumerate(env.tolist()):
+        c = attack if v > y else release
+        y = c * y + (1.0 - c) * v
+        out[i] = y
+    return out
+
+
+def coeff(ms: float, block_ms: float) -> float:
+    return float(np.exp(-block_ms / max(ms, 1e-6)))
+
+
+def to_samples(block_values: np.ndarray, block: int, n: int) -> np.ndarray:
+    centers = (np.arange(len(block_values)) + 0.5) * block
+    return np.interp(np.arange(n), centers, block_values).astype(np.float32)
+
+
+def duck_gain(voice: np.ndarray, sr: int) -> np.ndarray:
+    """
+    Per-sample gain for the music bed, driven by the voice envelope.
+    """
+    block = max(1, int(sr * BLOCK_MS / 1000.0))
+    peak_db = 20.0 * np.log10(block_peaks(voice, block) + 1e-9)
+    target = np.clip((peak_db - VOICE_THRESHOLD_DB) / VOICE_RANGE_DB, 0.0, 1.0)
+    # Follow the duck amount rather than the raw level, so attack/release
+    # are the actual time constants of the gain change
+    amount = smooth(target, coeff(ATTACK_MS, BLOCK_MS), coeff(RELEASE_MS, BLOCK_MS))
+    gain = db_to_gain(MUSIC_GAIN_DB + DUCK_DB * amount)
+    return to_samples(gain, block, len(voice))
+
+
+def fades(n: int, sr: int) -> np.ndarray:
+    g = np.ones(n, dtype=np.float32)
+    fi = min(n, int(sr * FADE_IN_MS / 1000.0))
+    fo = min(n, int(sr * FADE_OUT_MS / 1000.0))
+    if fi:
+        g[:fi] *= np.linspace(0.0, 1.0, fi, dtype=np.float32)
+    if fo:
+        g[n - fo:] *= np.linspace(1.0, 0.0, fo, dtype=np.float32)
+    return g
+
+
+def limit(x: np.ndarray, sr: int) -> np.ndarray:
+    """
+    Peak limiter: gain drops instantly (one block of look-ahead) and
+    recovers with LIMIT_RELEASE_MS; a final clip catches inter-block peaks.
+    """
+    ceiling = float(db_to_gain(LIMIT_DB))
+    block = max(1, int(sr * BLOCK_MS / 1000.0))
+    peaks = block_peaks(x, block)
+    # Look one block ahead so the gain is already down when the peak arrives
+    peaks = np.maximum(peaks, np.append(peaks[1:], 0.0))
+    need = np.minimum(1.0, ceiling / np.maximum(peaks, 1e-9))
+
+    # Release-only smoothing on the reduction (1 - gain): attack is instant
+    reduction = smooth(1.0 - need, 0.0, coeff(LIMIT_RELEASE_MS, BLOCK_MS))
+    gain = to_samples(1.0 - reduction, block, len(x))
+    return np.clip(x * gain, -ceiling, ceiling)
+
+
+def mix_arrays(
+    voice: np.ndarray,
+    music: Optional[np.ndarray],
+    sr: int,
+) -> np.ndarray:
+    """
+    Duck `music` under `voice`, fade it, sum and limit. `music` must already
+    be at `sr`; it is looped/trimmed to the voice length.
+    """
+    out = voice.astype(np.float32, copy=True)
+    if music is not None:
+        with perf_trace.span("mix.duck"):
+            bed = fit_length(music, len(voice))
+            out += bed * duck_gain(voice, sr) * fades(len(voice), sr)
+    with perf_trace.span("mix.limit"):
+        return limit(out, sr)
+
+
+# ------------------------- main ------------------------- #
+
+def mix(
+    narration_path: str = NARRATION_FILE,
+    output_path: str = OUTPUT_FILE,
+    music_dir: str = MUSIC_DIR,
+    music_path: Optional[str] = None,
+) -> float:
+    """
+    Write `output_path` from the narration and a music bed; returns seconds.
+    """
+    if not os.path.isfile(narration_path):
+        raise SystemExit(f"[MIX] Narration not found: {narration_path}")
+
+    with perf_trace.span("mix.load"):
+        voice, sr = read_wav(narration_path)
+        voice = resample(voice, sr, SAMPLE_RATE)
+
+        if music_path is None:
+            tracks = find_music_files(music_dir)
+            music_path = random.choice(tracks) if tracks else None
+
+        music = None
+        if music_path:
+            log(f"Using music bed: {music_path}")
+            music, msr = read_audio(music_path)
+            music = resample(music, msr, SAMPLE_RATE)
+        else:
+            log(f"No music in {music_dir}/ — narration only")
+
+    out = mix_arrays(voice, music, SAMPLE_RATE)
+
+    with perf_trace.span("mix.write"):
+        write_wav(output_path, out, SAMPLE_RATE)
+
+    seconds = len(out) / SAMPLE_RATE
+    log(f"Done. Wrote {output_path} ({seconds:.1f}s)")
+    return seconds
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Duck a music bed under the narration.")
+    p.add_argument("--narration", default=NARRATION_FILE, help=f"Voice WAV (default: {NARRATION_FILE}).")
+    p.add_argument("--output", default=OUTPUT_FILE, help=f"Output WAV (default: {OUTPUT_FILE}).")
+    p.add_argument("--music-dir", default=MUSIC_DIR, help=f"Music beds directory (default: {MUSIC_DIR}).")
+    p.add_argument("--music", default=None, help="Use this track instead of a random one.")
+    args = p.parse_args()
+
+    mix(args.narration, args.output, args.music_dir, args.music)
+
+
+if __name__ == "__main__":
+    main()
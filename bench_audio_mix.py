@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Real-time-factor benchmark for audio_mix.py.
+
+Synthesizes a 35 s narration-like signal (noise bursts shaped like phrases
+with pauses) and a 12 s stereo music loop, writes both as WAV, then times
+the full mix() (read, resample, duck, fade, limit, write). Fails if the
+real-time factor (processing time / audio duration) exceeds the budget.
+
+Usage:
+    python bench_audio_mix.py
+    python bench_audio_mix.py --seconds 60 --runs 5 --max-rtf 0.05
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import audio_mix
+
+SR = audio_mix.SAMPLE_RATE
+
+
+def log(msg: str) -> None:
+    print(f"[BENCH] {msg}", flush=True)
+
+
+def write_pcm16(path: str, x: np.ndarray, sr: int, channels: int = 1) -> None:
+    pcm = np.clip(x * 32767.0, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+
+
+def fake_voice(seconds: float, sr: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    # ~2.5 s phrases separated by ~0.4 s pauses, syllable-rate modulation
+    phrase = ((t % 2.9) < 2.5).astype(np.float32)
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * t)
+    carrier = rng.standard_normal(n).astype(np.float32) * 0.15
+    carrier += 0.3 * np.sin(2 * np.pi * 140.0 * t)
+    return (carrier * syllables * phrase).astype(np.float32)
+
+
+def fake_music(seconds: float, sr: int) -> np.ndarray:
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    chord = sum(np.sin(2 * np.pi * f * t) for f in (110.0, 164.8, 220.0, 277.2))
+    left = 0.2 * chord
+    right = 0.2 * np.roll(chord, 200)
+    return np.stack([left, right], axis=1).reshape(-1).astype(np.float32)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark audio_mix.mix().")
+    p.add_argument("--seconds", type=float, default=35.0, help="Narration length (default: 35).")
+    p.add_argument("--runs", type=int, default=3, help="Timed runs; best is reported (default: 3).")
+    p.add_argument("--max-rtf", type=float, default=0.1, help="Real-time factor budget (default: 0.1).")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        narration = os.path.join(tmp, "narration.wav")
+        music = os.path.join(tmp, "bed.wav")
+        output = os.path.join(tmp, "final_audio.wav")
+
+        # 24 kHz like XTTS output, so resampling is part of the measurement
+        write_pcm16(narration, fake_voice(args.seconds, 24000), 24000)
+        write_pcm16(music, fake_music(12.0, SR), SR, channels=2)
+
+        best = float("inf")
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            audio_mix.mix(narration, output, music_path=music)
+            best = min(best, time.perf_counter() - t0)
+
+    rtf = best / args.seconds
+    log(f"{args.seconds:.0f}s mix in {best * 1000:.0f} ms — RTF {rtf:.4f} "
+        f"({1 / rtf:.0f}× real time, budget RTF {args.max_rtf})")
+
+    if rtf > args.max_rtf:
+        log("❌ Audio mix slower than budget")
+        sys.exit(1)
+    log("✅ Audio mix within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the stage scripts.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each stage module, takes the best cumulative import time over a few runs and
+fails if any module exceeds its budget. Heavy dependencies (torch, TTS,
+whisper, moviepy, google/azure clients) must stay behind functions; pulling
+one of them back to module level blows the budget by an order of magnitude.
+
+Usage:
+    python bench_import.py            # check all modules
+    python bench_import.py --runs 5   # more samples per module
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, Optional
+
+# Cumulative import budget per module, in milliseconds.
+BUDGETS_MS: Dict[str, float] = {
+    "script_generate": 100.0,
+    "image_fetch": 100.0,
+    "tts_generate": 100.0,
+    "subtitles_build": 100.0,
+    "video_build": 100.0,
+    "youtube_upload": 100.0,
+    "final_render": 100.0,
+    "pipeline": 100.0,
+    "perf_trace": 100.0,
+    "spool": 100.0,
+    "upload_worker": 100.0,
+    # numpy is the whole point of this module, so it is imported eagerly
+    "audio_mix": 250.0,
+}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def log(msg: str) -> None:
+    print(f"[BENCH] {msg}", flush=True)
+
+
+def parse_importtime(stderr: str, module: str) -> Optional[float]:
+    """
+    Return the cumulative import time of `module` in ms from -X importtime
+    output, or None if the module line is missing.
+    """
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or parts[2].strip() != module:
+            continue
+        try:
+            return int(parts[1].strip()) / 1000.0
+        except ValueError:
+            return None
+    return None
+
+
+def measure(module: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise SystemExit(f"[BENCH] import {module} failed:\n{proc.stderr}")
+        ms = parse_importtime(proc.stderr, module)
+        if ms is None:
+            raise SystemExit(f"[BENCH] no importtime line for {module}")
+        best = min(best, ms)
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Check stage module import budgets.")
+    p.add_argument("--runs", type=int, default=3, help="Samples per module (default: 3).")
+    args = p.parse_args()
+
+    failed = []
+    for module, budget in BUDGETS_MS.items():
+        ms = measure(module, args.runs)
+        status = "ok" if ms <= budget else "OVER BUDGET"
+        log(f"{module:<16} {ms:8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        if ms > budget:
+            failed.append(module)
+
+    if failed:
+        log(f"❌ Import budget exceeded: {', '.join(failed)}")
+        sys.exit(1)
+
+    log("✅ All modules within import budget")
+
+
+if __name__ == "__main__":
+    main()
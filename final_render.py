@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+
+import perf_trace
+
+# ---------------- CONFIG ----------------
+VIDEO_FILE = "video_raw.mp4"
+AUDIO_FILE = "final_audio.wav"
+SUBS_FILE = "subs.ass"
+OUTPUT_FILE = "output.mp4"
+# ----------------------------------------
+
+
+def log(msg: str):
+    print(f"[RENDER] {msg}", flush=True)
+
+
+def render(
+    video_path: str = VIDEO_FILE,
+    audio_path: str = AUDIO_FILE,
+    subs_path: str = SUBS_FILE,
+    output_path: str = OUTPUT_FILE,
+) -> None:
+    """
+    Burn subtitles into the raw video and mux the narration track.
+    """
+    for path in (video_path, audio_path, subs_path):
+        if not os.path.isfile(path):
+            raise SystemExit(f"[RENDER] Missing input: {path}")
+
+    log(f"Rendering {output_path}")
+
+    with perf_trace.span("render.encode"):
+        subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-i", video_path,
+                "-i", audio_path,
+                "-vf", f"ass={subs_path},scale=1080:1920:flags=lanczos",
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "libx264",
+                "-pix_fmt", "yuv420p",
+                "-preset", "fast",
+                "-crf", "18",
+                "-movflags", "+faststart",
+                "-c:a", "aac",
+                "-b:a", "192k",
+                output_path,
+            ],
+            check=True,
+        )
+
+    log("Done")
+
+
+if __name__ == "__main__":
+    render()
@@ -3,17 +3,17 @@ import os
 import json
 import hashlib
 import random
-import requests
+import threading
 from io import BytesIO
-from PIL import Image
+
+import perf_trace
+
+# requests and PIL are imported inside the functions that use them so that
+# importing this module stays cheap.
 
 # --------------------------------------------------
 # CONFIG
 # --------------------------------------------------
-PEXELS_KEY = os.getenv("PEXELS_API_KEY") or os.getenv("PEXELS_KEY")
-if not PEXELS_KEY:
-    raise SystemExit("❌ PEXELS_API_KEY / PEXELS_KEY missing")
-
 FRAMES_DIR = "frames"
 PROMPTS_FILE = "image_prompts.json"
 USED_IMAGES_FILE = "used_images.json"
@@ -21,8 +21,9 @@ USED_IMAGES_FILE = "used_images.json"
 TARGET_W, TARGET_H = 1080, 1920
 MIN_WIDTH = 1600
 
-os.makedirs(FRAMES_DIR, exist_ok=True)
-HEADERS = {"Authorization": PEXELS_KEY}
+# Guards used_images.json and the in-memory set when batch jobs fetch
+# concurrently, so two Shorts never claim the same photo.
+_used_lock = threading.Lock()
 
 BANNED_TERMS = [
     "woman", "women", "girl", "female",
@@ -44,6 +45,12 @@ FALLBACK_PROMPTS = [
 def log(msg):
     print(f"[IMG] {msg}", flush=True)
 
+def get_headers():
+    key = os.getenv("PEXELS_API_KEY") or os.getenv("PEXELS_KEY")
+    if not key:
+        raise SystemExit("❌ PEXELS_API_KEY / PEXELS_KEY missing")
+    return {"Authorization": key}
+
 def load_used():
     if os.path.exists(USED_IMAGES_FILE):
         try:
@@ -68,7 +75,9 @@ def is_halal(photo) -> bool:
     ]).lower()
     return not any(b in text for b in BANNED_TERMS)
 
-def make_vertical(img: Image.Image) -> Image.Image:
+def make_vertical(img):
+    from PIL import Image
+
     w, h = img.size
     scale = max(TARGET_W / w, TARGET_H / h)
     img = img.resize((int(w * scale), int(h * scale)), Image.Resampling.LANCZOS)
@@ -76,17 +85,23 @@ def make_vertical(img: Image.Image) -> Image.Image:
     top = (img.height - TARGET_H) // 2
     return img.crop((left, top, left + TARGET_W, top + TARGET_H))
 
-def search(prompt: str):
+def search(prompt: str, headers):
+    import requests
+
     url = (
         "https://api.pexels.com/v1/search"
         f"?query={prompt}&orientation=portrait&per_page=40"
     )
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    return r.json().get("photos", [])
+    with perf_trace.span("pexels.search", query=prompt):
+        r = requests.get(url, headers=headers, timeout=20)
+        r.raise_for_status()
+        return r.json().get("photos", [])
+
+def try_fetch(prompt, filename, used, headers, frames_dir=FRAMES_DIR):
+    import requests
+    from PIL import Image
 
-def try_fetch(prompt, filename, used):
-    photos = search(prompt)
+    photos = search(prompt, headers)
     random.shuffle(photos)
 
     for p in photos:
@@ -98,40 +113,61 @@ def try_fetch(prompt, filename, used):
             continue
 
         h = hash_url(src)
-        if h in used:
-            continue
+        with _used_lock:
+            if h in used:
+                continue
+            # Claim before downloading so a concurrent job skips it
+            used.add(h)
 
         try:
-            img = Image.open(BytesIO(requests.get(src, timeout=15).content)).convert("RGB")
-            img = make_vertical(img)
-            img.save(os.path.join(FRAMES_DIR, filename), quality=95, subsampling=0)
-            used.add(h)
+            with perf_trace.span("pexels.download") as info:
+                data = requests.get(src, timeout=15).content
+                info["bytes"] = len(data)
+            with perf_trace.span("image.decode"):
+                img = Image.open(BytesIO(data)).convert("RGB")
+                img = make_vertical(img)
+            with perf_trace.span("image.save"):
+                img.save(os.path.join(frames_dir, filename), quality=95, subsampling=0)
             log(f"Saved {filename} ← {prompt}")
             return True
         except Exception:
+            with _used_lock:
+                used.discard(h)
             continue
 
     return False
 
-def main():
-    with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
-        prompts = json.load(f)
+def fetch_images(prompts, frames_dir=FRAMES_DIR, used=None):
+    """
+    Fetch one frame per prompt into `frames_dir`. Pass a shared `used` set to
+    dedupe across concurrent calls; it is merged into used_images.json.
+    """
+    headers = get_headers()
+    os.makedirs(frames_dir, exist_ok=True)
 
-    used = load_used()
+    if used is None:
+        used = load_used()
 
     for i, prompt in enumerate(prompts, 1):
         fname = f"img_{i:03d}.jpg"
-        if try_fetch(prompt, fname, used):
+        if try_fetch(prompt, fname, used, headers, frames_dir):
             continue
 
         for fb in FALLBACK_PROMPTS:
-            if try_fetch(fb, fname, used):
+            if try_fetch(fb, fname, used, headers, frames_dir):
                 break
         else:
             raise RuntimeError("Image fetch failed completely")
 
-    save_used(used)
+    with _used_lock:
+        save_used(load_used() | used)
     log("✅ Images fetched")
 
+def main():
+    with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
+        prompts = json.load(f)
+
+    fetch_images(prompts)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Aggregate perf_trace JSONL files from many runs into per-span statistics.
+
+For every span name it prints:
+- n         number of spans across all runs
+- runs      number of runs the span appears in
+- p50/p95   wall time of a single span
+- run p50/p95  total wall time per run (sums repeated spans such as
+            tts.chunk or pexels.search, which is what counts against the
+            job budget)
+- cpu p50   CPU seconds of the calling thread (Python-side work)
+- proc p50  CPU seconds of the whole process (torch worker threads; also
+            counts stages running concurrently)
+- child p50 CPU seconds of subprocesses reaped in the span (ffmpeg/x264)
+- rss+ max  largest RSS growth over a single span
+- peak MB   process RSS high-water mark at span end — a property of the
+            process up to that point, not of the span
+
+Usage:
+    python perf_report.py traces/                 # every *.jsonl in traces/
+    python perf_report.py a.jsonl b.jsonl --sort run_p95
+    python perf_report.py traces/ --prefix stage.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+COLUMNS = [
+    "n", "runs", "p50", "p95", "run_p50", "run_p95",
+    "cpu_p50", "proc_cpu_p50", "child_cpu_p50", "rss_delta_max", "peak_rss_max",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Linear-interpolated percentile, q in [0, 100].
+    """
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def expand(paths: Iterable[str]) -> List[str]:
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(glob.glob(os.path.join(p, "**", "*.jsonl"), recursive=True))
+        else:
+            files.append(p)
+    return files
+
+
+def load(files: Iterable[str]) -> List[Dict[str, Any]]:
+    records = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    return records
+
+
+def aggregate(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    walls = defaultdict(list)
+    cpus = defaultdict(list)
+    proc_cpus = defaultdict(list)
+    child_cpus = defaultdict(list)
+    rss_delta = defaultdict(float)
+    peak_rss = defaultdict(float)
+    per_run = defaultdict(lambda: defaultdict(float))
+
+    for r in records:
+        name = r["name"]
+        walls[name].append(r["wall_s"])
+        cpus[name].append(r["cpu_s"])
+        # Older traces only have thread CPU and the high-water mark
+        proc_cpus[name].append(r.get("proc_cpu_s", 0.0))
+        child_cpus[name].append(r.get("child_cpu_s", 0.0))
+        rss_delta[name] = max(rss_delta[name], r.get("rss_delta_mb", 0.0))
+        peak_rss[name] = max(peak_rss[name], r.get("peak_rss_mb", 0.0))
+        per_run[name][r["run"]] += r["wall_s"]
+
+    stats = {}
+    for name, w in walls.items():
+        totals = list(per_run[name].values())
+        stats[name] = {
+            "n": len(w),
+            "runs": len(totals),
+            "p50": percentile(w, 50),
+            "p95": percentile(w, 95),
+            "run_p50": percentile(totals, 50),
+            "run_p95": percentile(totals, 95),
+            "cpu_p50": percentile(cpus[name], 50),
+            "proc_cpu_p50": percentile(proc_cpus[name], 50),
+            "child_cpu_p50": percentile(child_cpus[name], 50),
+            "rss_delta_max": rss_delta[name],
+            "peak_rss_max": peak_rss[name],
+        }
+    return stats
+
+
+def print_table(stats: Dict[str, Dict[str, float]], sort: str) -> None:
+    width = max([len(n) for n in stats] + [4])
+    print("cpu = calling thread, proc = whole process, child = subprocesses (ffmpeg);")
+    print("rss+ = RSS growth within the span; peak MB = process RSS high-water mark\n")
+    print(
+        f"{'span':<{width}} {'n':>5} {'runs':>5} {'p50 s':>8} {'p95 s':>8} "
+        f"{'run p50':>8} {'run p95':>8} {'cpu p50':>8} {'proc p50':>8} {'child p50':>9} "
+        f"{'rss+ MB':>8} {'peak MB':>8}"
+    )
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1][sort]):
+        print(
+            f"{name:<{width}} {s['n']:>5} {s['runs']:>5} {s['p50']:>8.2f} {s['p95']:>8.2f} "
+            f"{s['run_p50']:>8.2f} {s['run_p95']:>8.2f} {s['cpu_p50']:>8.2f} "
+            f"{s['proc_cpu_p50']:>8.2f} {s['child_cpu_p50']:>9.2f} "
+            f"{s['rss_delta_max']:>8.0f} {s['peak_rss_max']:>8.0f}"
+        )
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Aggregate perf_trace runs into p50/p95 per span.")
+    p.add_argument("paths", nargs="+", help="Trace .jsonl files or directories containing them.")
+    p.add_argument(
+        "--sort",
+        choices=COLUMNS,
+        default="run_p95",
+        help="Column to sort by, descending (default: run_p95).",
+    )
+    p.add_argument("--prefix", default="", help="Only spans whose name starts with this.")
+    p.add_argument("--json", action="store_true", help="Print the statistics as JSON.")
+    args = p.parse_args()
+
+    files = expand(args.paths)
+    if not files:
+        print("No trace files found", file=sys.stderr)
+        sys.exit(1)
+
+    records = [r for r in load(files) if r["name"].startswith(args.prefix)]
+    stats = aggregate(records)
+
+    if args.json:
+        json.dump(stats, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+
+    runs = len({r["run"] for r in records})
+    print(f"{len(records)} spans from {runs} run(s) in {len(files)} file(s)\n")
+    print_table(stats, args.sort)
+
+
+if __name__ == "__main__":
+    main()
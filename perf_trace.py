@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Minimal span tracer shared by every stage.
+
+    import perf_trace
+
+    with perf_trace.span("tts.chunk", index=i, words=n):
+        ...
+
+Each span records:
+
+    wall_s        wall time
+    cpu_s         CPU time of the calling thread
+    proc_cpu_s    CPU time of the whole process (includes torch's intra-op
+                  threads, so it is the number for tts.* / whisper.* spans;
+                  also includes any other stage running at the same time)
+    child_cpu_s   CPU time of child processes reaped during the span (the
+                  ffmpeg behind video.encode / render.encode)
+    rss_mb        current RSS at span end
+    rss_delta_mb  RSS change over the span (what the span itself kept)
+    peak_rss_mb   process RSS high-water mark so far, not per span
+
+Spans are kept in memory and written when the process exits (or on
+`write()`), if tracing is enabled via $PERF_TRACE_DIR or `configure()`:
+
+    <dir>/<run>.jsonl        one JSON object per span
+    <dir>/<run>.trace.json   Chrome trace_event format (chrome://tracing,
+                             https://ui.perfetto.dev)
+
+perf_report.py aggregates the .jsonl files of many runs.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # non-POSIX
+    resource = None
+
+_lock = threading.Lock()
+_spans: List[Dict[str, Any]] = []
+_trace_dir: Optional[str] = None
+_run_id = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+
+
+def log(msg: str) -> None:
+    print(f"[TRACE] {msg}", flush=True)
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size (Linux /proc; 0 elsewhere).
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+
+
+def children_cpu_s() -> float:
+    if resource is None:
+        return 0.0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def configure(trace_dir: Optional[str], run_id: Optional[str] = None) -> None:
+    """
+    Enable writing to `trace_dir` at exit (None disables it).
+    """
+    global _trace_dir, _run_id
+    _trace_dir = trace_dir
+    if run_id:
+        _run_id = run_id
+
+
+def enabled() -> bool:
+    return _trace_dir is not None
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time the enclosed block. The yielded dict is the span's args and may be
+    updated inside the block (e.g. with byte counts).
+    """
+    wall0 = time.time()
+    perf0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    proc0 = time.process_time()
+    child0 = children_cpu_s()
+    rss0 = rss_mb()
+    error = None
+    try:
+        yield args
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        rss1 = rss_mb()
+        record = {
+            "run": _run_id,
+            "name": name,
+            "start": wall0,
+            "wall_s": time.perf_counter() - perf0,
+            "cpu_s": time.thread_time() - cpu0,
+            "proc_cpu_s": time.process_time() - proc0,
+            "child_cpu_s": children_cpu_s() - child0,
+            "rss_mb": rss1,
+            "rss_delta_mb": rss1 - rss0,
+            "peak_rss_mb": peak_rss_mb(),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "thread": threading.current_thread().name,
+            "args": args,
+        }
+        if error:
+            record["error"] = error
+        with _lock:
+            _spans.append(record)
+
+
+def spans() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_spans)
+
+
+def to_chrome(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    events = []
+    threads = {}
+    for r in records:
+        threads[(r["pid"], r["tid"])] = r["thread"]
+        events.append({
+            "name": r["name"],
+            "cat": r["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": r["start"] * 1e6,
+            "dur": r["wall_s"] * 1e6,
+            "pid": r["pid"],
+            "tid": r["tid"],
+            "args": {
+                **r["args"],
+                "cpu_s": round(r["cpu_s"], 4),
+                "proc_cpu_s": round(r["proc_cpu_s"], 4),
+                "child_cpu_s": round(r["child_cpu_s"], 4),
+                "rss_mb": round(r["rss_mb"], 1),
+                "rss_delta_mb": round(r["rss_delta_mb"], 1),
+                "peak_rss_mb": round(r["peak_rss_mb"], 1),
+                **({"error": r["error"]} if "error" in r else {}),
+            },
+        })
+    for (pid, tid), thread in threads.items():
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": thread},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write(trace_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Write collected spans; returns the JSONL path, or None if nothing to do.
+    """
+    trace_dir = trace_dir or _trace_dir
+    records = spans()
+    if not trace_dir or not records:
+        return None
+
+    os.makedirs(trace_dir, exist_ok=True)
+    base = os.path.join(trace_dir, _run_id)
+
+    with open(base + ".jsonl", "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, default=str) + "\n")
+
+    with open(base + ".trace.json", "w", encoding="utf-8") as f:
+        json.dump(to_chrome(records), f, default=str)
+
+    log(f"Wrote {len(records)} spans to {base}.jsonl / .trace.json")
+    return base + ".jsonl"
+
+
+configure(os.environ.get("PERF_TRACE_DIR") or None)
+atexit.register(write)
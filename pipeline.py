@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+"""
+In-process pipeline runner for one Short.
+
+The stages form a DAG with declared inputs and outputs:
+
+    script ──┬── images ─────────────────────┐
+             └── tts ──┬── mix ──── video ───┼── render ── spool
+                       └── subtitles ────────┘
+
+Stages whose dependencies are satisfied run concurrently on a thread pool in
+a single interpreter. Threads are enough here: the expensive parts release
+the GIL (network I/O for script/images, torch kernels for XTTS and
+Whisper, the ffmpeg subprocess for x264), and sharing one interpreter lets
+the script text and image prompts pass between stages in memory.
+
+Cacheable stages are skipped when their inputs, code and parameters match
+an earlier successful run (see stage_cache.py). The script stage is keyed by
+run id ($GITHUB_RUN_ID or --run-id), so re-running a failed job reuses its
+script, images and narration while a fresh run always writes a new script.
+Without either, the run id is kept in <workdir>/.run_id until the Short is
+spooled (or rendered, with --no-spool), so a local re-run after a failure
+resumes the same Short; `--force script` starts a new one instead.
+
+The last stage drops output.mp4 + metadata.json into the upload spool
+(see spool.py); upload_worker.py publishes from there at its own pace, so a
+slow or failing upload never holds up the next render.
+
+Each stage is tagged with the resource it mostly uses: "net" (script,
+images, spool), "xtts" (tts), "whisper" (subtitles) or "cpu" (mix, video,
+render). The scheduler caps how many stages of each kind run at once, so in
+batch mode the network-bound stages of one Short overlap the XTTS/Whisper/x264
+work of another and the cores stay busy without being oversubscribed. The
+shared models serialize their callers anyway, so tts and subtitles get a
+slot of their own and a job waiting on a model never holds a CPU slot that
+an x264 encode could use.
+
+Batch mode (--batch) builds one job per product in products.json (or N per
+product with --per-product), each in its own runs/<product>-<n>/ working
+directory, and merges them into a single DAG. XTTS and Whisper are loaded
+once per process and shared by every job. A failing stage only skips the
+stages that depend on it: the other jobs still render and spool, a per-job
+summary is printed, and the exit status is 1 if any job failed.
+
+At the end a per-stage timing table and the critical path are printed.
+With --trace-dir (or $PERF_TRACE_DIR) every stage and the spans recorded
+inside it are written as JSONL + Chrome trace (see perf_trace.py).
+
+Usage:
+    python pipeline.py                 # full run in the current directory
+    python pipeline.py --no-spool      # stop after output.mp4
+    python pipeline.py --workdir out/  # keep artifacts under out/
+    python pipeline.py --force tts     # re-run tts even if cached
+    python pipeline.py --batch --per-product 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import perf_trace
+from stage_cache import StageCache
+
+# Stage modules are imported inside the stage functions so that each one
+# only pays for its own heavy dependencies when it actually runs.
+
+PRODUCTS_FILE = "products.json"
+RUNS_DIR = "runs"
+RUN_ID_FILE = ".run_id"
+
+# Concurrent stages allowed per resource kind. XTTS and Whisper are one
+# shared, lock-guarded model each, so more than one slot would only queue on
+# the lock; the two CPU slots are left to mix and the x264 encodes.
+DEFAULT_LIMITS = {"cpu": 2, "net": 4, "xtts": 1, "whisper": 1}
+
+
+def log(msg: str) -> None:
+    print(f"[PIPE] {msg}", flush=True)
+
+
+# ------------------------- DAG model ------------------------- #
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: List[str] = field(default_factory=list)
+    resource: str = "cpu"
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    # Caching: stages with `code` set are cacheable. `code` lists the modules
+    # whose source forms the code version; `load` rebuilds the in-memory
+    # result from the restored outputs when the stage is skipped.
+    code: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+    load: Optional[Callable[[], Any]] = None
+
+    @property
+    def step(self) -> str:
+        """Stage name without the batch job prefix, e.g. "tts"."""
+        return self.name.rsplit("/", 1)[-1]
+
+
+class StageFailures(RuntimeError):
+    """
+    Raised by run_dag() after every runnable stage has finished, when at
+    least one failed. Carries what is needed for the report.
+    """
+
+    def __init__(
+        self,
+        failures: Dict[str, BaseException],
+        skipped: Set[str],
+        timings: Dict[str, "StageTiming"],
+    ):
+        self.failures = failures
+        self.skipped = skipped
+        self.timings = timings
+        names = ", ".join(f"{n} ({e!r})" for n, e in failures.items())
+        super().__init__(f"{len(failures)} stage(s) failed: {names}")
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+    cached: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def validate(stages: List[Stage]) -> None:
+    names = {s.name for s in stages}
+    if len(names) != len(stages):
+        raise ValueError("Duplicate stage names")
+
+    for s in stages:
+        if s.resource not in DEFAULT_LIMITS:
+            raise ValueError(f"Stage {s.name} has unknown resource: {s.resource}")
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {missing}")
+
+    # Kahn's algorithm: every stage must become ready eventually
+    remaining = {s.name: set(s.deps) for s in stages}
+    while remaining:
+        ready = [n for n, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+        for n in ready:
+            del remaining[n]
+        for d in remaining.values():
+            d.difference_update(ready)
+
+
+def run_dag(
+    stages: List[Stage],
+    limits: Optional[Dict[str, int]] = None,
+    cache: Optional[StageCache] = None,
+    force: Iterable[str] = (),
+) -> Dict[str, StageTiming]:
+    """
+    Run `stages` respecting dependencies, launching ready stages as soon as a
+    slot for their resource kind is free (see DEFAULT_LIMITS). Ties go to the
+    stage listed first, so earlier batch jobs finish first.
+
+    Each stage function receives the dict of results produced so far (keyed
+    by stage name) and its return value is stored under its own name. A
+    failure only skips the stages that (transitively) depend on the failed
+    one, so in batch mode the other jobs still render and spool; once
+    everything runnable has finished, StageFailures is raised.
+
+    With a `cache`, cacheable stages not named in `force` (by full name or
+    step) are skipped when their key matches a stored result.
+    """
+    validate(stages)
+    force = set(force)
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    in_use = {r: 0 for r in limits}
+
+    by_name = {s.name: s for s in stages}
+    pending = dict(by_name)
+    results: Dict[str, Any] = {}
+    timings: Dict[str, StageTiming] = {}
+    running = {}
+    failures: Dict[str, BaseException] = {}
+    skipped: Set[str] = set()
+    t0 = time.perf_counter()
+
+    def skip_dependents(name: str) -> None:
+        for s in list(pending.values()):
+            if name in s.deps and s.name in pending:
+                del pending[s.name]
+                skipped.add(s.name)
+                log(f"⏭ {s.name} (needs {name})")
+                skip_dependents(s.name)
+
+    def call(stage: Stage):
+        with perf_trace.span(f"stage.{stage.step}", stage=stage.name) as info:
+            return run_one(stage, info)
+
+    def run_one(stage: Stage, info: Dict[str, Any]):
+        start = time.perf_counter() - t0
+        key = None
+        if cache is not None and stage.code:
+            # Inputs are complete now that every dependency has finished
+            key = cache.key(stage.step, stage.inputs, stage.code, stage.params)
+            forced = stage.name in force or stage.step in force
+            if not forced and cache.restore(key, stage.outputs):
+                timings[stage.name] = StageTiming(
+                    stage.name, start, time.perf_counter() - t0, cached=True
+                )
+                info["cached"] = True
+                return stage.load() if stage.load else None
+
+        try:
+            result = stage.func(results)
+        finally:
+            timings[stage.name] = StageTiming(stage.name, start, time.perf_counter() - t0)
+
+        if key is not None:
+            cache.store(key, stage.name, stage.outputs)
+        return result
+
+    workers = sum(limits.values())
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as pool:
+        while pending or running:
+            for s in list(pending.values()):
+                if in_use[s.resource] >= limits[s.resource]:
+                    continue
+                if not all(d in results for d in s.deps):
+                    continue
+                del pending[s.name]
+                in_use[s.resource] += 1
+                log(f"▶ {s.name}")
+                running[pool.submit(call, s)] = s
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s = running.pop(fut)
+                in_use[s.resource] -= 1
+                try:
+                    results[s.name] = fut.result()
+                    t = timings[s.name]
+                    log(f"✔ {s.name} ({'cached' if t.cached else f'{t.duration:.1f}s'})")
+                except BaseException as e:
+                    log(f"✖ {s.name}: {e!r}")
+                    failures[s.name] = e
+                    skip_dependents(s.name)
+
+    if failures:
+        raise StageFailures(failures, skipped, timings)
+
+    return timings
+
+
+def critical_path(stages: List[Stage], timings: Dict[str, StageTiming]) -> List[str]:
+    """
+    Return the chain of stages with the largest summed duration, i.e. the
+    stages that bound the wall time no matter how much else runs in parallel.
+    """
+    by_name = {s.name: s for s in stages}
+    best: Dict[str, float] = {}
+    prev: Dict[str, Optional[str]] = {}
+
+    def visit(name: str) -> float:
+        if name in best:
+            return best[name]
+        parent, parent_cost = None, 0.0
+        for d in by_name[name].deps:
+            cost = visit(d)
+            if cost > parent_cost:
+                parent, parent_cost = d, cost
+        best[name] = parent_cost + timings[name].duration
+        prev[name] = parent
+        return best[name]
+
+    for name in timings:
+        visit(name)
+
+    node: Optional[str] = max(best, key=best.get) if best else None
+    path: List[str] = []
+    while node is not None:
+        path.append(node)
+        node = prev[node]
+    return path[::-1]
+
+
+def report(stages: List[Stage], timings: Dict[str, StageTiming]) -> None:
+    log("Stage timings:")
+    width = max((len(n) for n in timings), default=10)
+    for t in sorted(timings.values(), key=lambda t: t.start):
+        note = "  (cached)" if t.cached else ""
+        log(f"  {t.name:<{width}} start {t.start:7.1f}s  end {t.end:7.1f}s  took {t.duration:7.1f}s{note}")
+
+    wall = max((t.end for t in timings.values()), default=0.0)
+    serial = sum(t.duration for t in timings.values())
+    path = critical_path(stages, timings)
+    path_sec = sum(timings[n].duration for n in path)
+
+    log(f"Critical path: {' → '.join(path)} ({path_sec:.1f}s)")
+    log(f"Wall time {wall:.1f}s vs {serial:.1f}s if run serially")
+
+
+def job_of(name: str) -> str:
+    """Batch job prefix of a stage name ("" outside batch mode)."""
+    return name.rsplit("/", 1)[0] if "/" in name else ""
+
+
+def report_jobs(stages: List[Stage], failures: Dict[str, BaseException], skipped: Set[str]) -> None:
+    jobs: Dict[str, List[Stage]] = {}
+    for s in stages:
+        jobs.setdefault(job_of(s.name), []).append(s)
+
+    log("Job results:")
+    for job, job_stages in jobs.items():
+        label = job or "(single run)"
+        failed = [s.name for s in job_stages if s.name in failures]
+        if not failed:
+            log(f"  ✔ {label}")
+            continue
+        not_run = [s.step for s in job_stages if s.name in skipped]
+        errors = "; ".join(f"{n.rsplit('/', 1)[-1]}: {failures[n]!r}" for n in failed)
+        log(f"  ✖ {label} — {errors}" + (f" (skipped {', '.join(not_run)})" if not_run else ""))
+
+
+# ------------------------- stages ------------------------- #
+
+def workdir_run_id(workdir: str) -> str:
+    """
+    Run id saved in `workdir`, created on first use. It stays until
+    clear_run_id() marks the Short as finished.
+    """
+    path = os.path.join(workdir, RUN_ID_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            run_id = f.read().strip()
+        if run_id:
+            log(f"Resuming run {run_id} from {path}")
+            return run_id
+    except OSError:
+        pass
+
+    run_id = uuid.uuid4().hex
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(run_id + "\n")
+    return run_id
+
+
+def clear_run_id(workdir: str) -> None:
+    path = os.path.join(workdir, RUN_ID_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def build_stages(
+    workdir: str = ".",
+    spool_dir: Optional[str] = None,
+    run_id: Optional[str] = None,
+    job: str = "",
+    product: Optional[Dict[str, Any]] = None,
+    used_images: Optional[Set[str]] = None,
+) -> List[Stage]:
+    """
+    Stages for one Short. In batch mode `job` prefixes every stage name,
+    `product` steers the script and language, and `used_images` is the set
+    shared by all jobs so no two Shorts reuse a photo.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    language = (product or {}).get("language", "en")
+
+    # No CI run id: reuse the one saved in the workdir until this Short ships
+    finish_run = run_id is None
+    if finish_run:
+        run_id = workdir_run_id(workdir)
+
+    def path(name: str) -> str:
+        return os.path.join(workdir, name)
+
+    def name(step: str) -> str:
+        return f"{job}/{step}" if job else step
+
+    script_file = path("script.txt")
+    prompts_file = path("image_prompts.json")
+    metadata_file = path("metadata.json")
+    frames_dir = path("frames")
+    narration_file = path("narration.wav")
+    audio_file = path("final_audio.wav")
+    subs_file = path("subs.ass")
+    raw_video = path("video_raw.mp4")
+    output_video = path("output.mp4")
+    voices_dir = "voices"
+    music_dir = "music"
+
+    def run_script(results):
+        import script_generate
+        script, images = script_generate.generate(
+            script_file, prompts_file, product, metadata_file
+        )
+        return {"script": script, "images": images}
+
+    def run_images(results):
+        import image_fetch
+        image_fetch.fetch_images(results[name("script")]["images"], frames_dir, used_images)
+
+    def run_tts(results):
+        import tts_generate
+        tts_generate.synthesize(results[name("script")]["script"], narration_file, language=language)
+
+    def run_mix(results):
+        import audio_mix
+        audio_mix.mix(narration_file, audio_file, music_dir)
+
+    def run_subtitles(results):
+        import subtitles_build
+        # Transcribe the dry narration: no music under the voice
+        subtitles_build.build_subs(narration_file, subs_file, language=language)
+
+    def run_video(results):
+        import video_build
+        video_build.build_video(audio_file, frames_dir, raw_video)
+
+    def run_render(results):
+        import final_render
+        final_render.render(raw_video, audio_file, subs_file, output_video)
+        if finish_run and not spool_dir:
+            clear_run_id(workdir)
+
+    def run_spool(results):
+        import spool
+        entry_id = spool.enqueue(output_video, metadata_file, spool_dir)
+        if finish_run:
+            clear_run_id(workdir)
+        return entry_id
+
+    def load_script():
+        with open(script_file, "r", encoding="utf-8") as f:
+            script = f.read()
+        with open(prompts_file, "r", encoding="utf-8") as f:
+            images = json.load(f)
+        return {"script": script, "images": images}
+
+    stages = [
+        Stage(name("script"), run_script, resource="net",
+              outputs=[script_file, prompts_file, metadata_file],
+              code=["script_generate"],
+              params={"run_id": run_id, "product": product},
+              load=load_script),
+        Stage(name("images"), run_images, deps=[name("script")], resource="net",
+              inputs=[prompts_file], outputs=[frames_dir],
+              code=["image_fetch"]),
+        Stage(name("tts"), run_tts, deps=[name("script")], resource="xtts",
+              inputs=[script_file, voices_dir], outputs=[narration_file],
+              code=["tts_generate"],
+              params={"model": os.environ.get("TTS_MODEL_NAME", ""), "language": language}),
+        Stage(name("mix"), run_mix, deps=[name("tts")],
+              inputs=[narration_file, music_dir], outputs=[audio_file],
+              code=["audio_mix"]),
+        Stage(name("subtitles"), run_subtitles, deps=[name("tts")], resource="whisper",
+              inputs=[narration_file], outputs=[subs_file],
+              code=["subtitles_build"],
+              params={"language": language}),
+        Stage(name("video"), run_video, deps=[name("images"), name("mix")],
+              inputs=[audio_file, frames_dir], outputs=[raw_video],
+              code=["video_build"]),
+        # Not cached: output.mp4 is the biggest artifact and render is the
+        # last encode, so a cache entry costs more space than a re-run saves
+        Stage(name("render"), run_render, deps=[name("video"), name("subtitles")],
+              inputs=[raw_video, audio_file, subs_file], outputs=[output_video]),
+    ]
+    if spool_dir:
+        # Local copy only; tagged "net" so it never waits behind a CPU slot
+        stages.append(Stage(name("spool"), run_spool, deps=[name("render")],
+                            resource="net", inputs=[output_video, metadata_file]))
+    return stages
+
+
+def load_products(path: str = PRODUCTS_FILE) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        products = json.load(f)
+
+    if not isinstance(products, list) or not products:
+        raise SystemExit(f"[PIPE] {path} must be a non-empty JSON list")
+    for p in products:
+        if not p.get("id"):
+            raise SystemExit(f"[PIPE] Product without an id in {path}: {p}")
+    return products
+
+
+def build_batch(
+    products: List[Dict[str, Any]],
+    per_product: int = 1,
+    runs_dir: str = RUNS_DIR,
+    spool_dir: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> List[Stage]:
+    """
+    One job per product (times `per_product`), each in runs_dir/<id>-<n>/.
+    """
+    import image_fetch
+
+    used_images = image_fetch.load_used()
+    stages: List[Stage] = []
+    for product in products:
+        for n in range(1, per_product + 1):
+            job = f"{product['id']}-{n}"
+            stages += build_stages(
+                os.path.join(runs_dir, job),
+                spool_dir=spool_dir,
+                run_id=f"{run_id}-{job}" if run_id else None,
+                job=job,
+                product=product,
+                used_images=used_images,
+            )
+    return stages
+
+
+# ------------------------- CLI ------------------------- #
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Run the Shorts pipeline in one process.")
+    p.add_argument(
+        "--workdir",
+        default=".",
+        help="Directory for all intermediate and final artifacts (default: .).",
+    )
+    p.add_argument(
+        "--spool-dir",
+        default=None,
+        help="Upload spool directory (default: $SPOOL_DIR or spool).",
+    )
+    p.add_argument(
+        "--no-spool",
+        dest="spool",
+        action="store_false",
+        help="Stop after rendering output.mp4 without queueing it for upload.",
+    )
+    p.add_argument(
+        "--batch",
+        nargs="?",
+        const=PRODUCTS_FILE,
+        default=None,
+        metavar="PRODUCTS",
+        help=f"Render one Short per product from PRODUCTS (default: {PRODUCTS_FILE}).",
+    )
+    p.add_argument(
+        "--per-product",
+        type=int,
+        default=1,
+        help="Shorts per product in batch mode (default: 1).",
+    )
+    p.add_argument(
+        "--runs-dir",
+        default=RUNS_DIR,
+        help=f"Parent of the per-job working directories in batch mode (default: {RUNS_DIR}).",
+    )
+    p.add_argument(
+        "--cpu-slots",
+        type=int,
+        default=DEFAULT_LIMITS["cpu"],
+        help=f"CPU-bound stages (mix, video, render) running at once (default: {DEFAULT_LIMITS['cpu']}).",
+    )
+    p.add_argument(
+        "--net-slots",
+        type=int,
+        default=DEFAULT_LIMITS["net"],
+        help=f"Network-bound stages running at once (default: {DEFAULT_LIMITS['net']}).",
+    )
+    p.add_argument(
+        "--run-id",
+        default=os.environ.get("GITHUB_RUN_ID"),
+        help="Reuse the cached script for this run id (default: $GITHUB_RUN_ID).",
+    )
+    p.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="Re-run STAGE even if cached (repeatable; 'all' forces every stage).",
+    )
+    p.add_argument(
+        "--trace-dir",
+        default=os.environ.get("PERF_TRACE_DIR"),
+        help="Write perf traces (JSONL + Chrome trace) here (default: $PERF_TRACE_DIR).",
+    )
+    p.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Disable the stage cache entirely.",
+    )
+    p.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=None,
+        help="Stage cache size cap in MB (default: $STAGE_CACHE_MAX_MB or 2048).",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.trace_dir:
+        perf_trace.configure(args.trace_dir)
+
+    spool_dir = None
+    if args.spool:
+        import spool
+        spool_dir = args.spool_dir or spool.SPOOL_DIR
+
+    if args.batch:
+        stages = build_batch(
+            load_products(args.batch),
+            per_product=args.per_product,
+            runs_dir=args.runs_dir,
+            spool_dir=spool_dir,
+            run_id=args.run_id,
+        )
+    else:
+        stages = build_stages(args.workdir, spool_dir=spool_dir, run_id=args.run_id)
+
+    names = {s.name for s in stages} | {s.step for s in stages}
+    force = names if "all" in args.force else set(args.force)
+    unknown = force - names
+    if unknown:
+        raise SystemExit(f"[PIPE] Unknown stage(s) for --force: {', '.join(sorted(unknown))}")
+
+    cache = None
+    if args.cache:
+        cache = StageCache(max_mb=args.cache_max_mb) if args.cache_max_mb else StageCache()
+
+    t0 = time.perf_counter()
+    try:
+        timings = run_dag(
+            stages,
+            limits={"cpu": args.cpu_slots, "net": args.net_slots},
+            cache=cache,
+            force=force,
+        )
+    except StageFailures as e:
+        report(stages, e.timings)
+        report_jobs(stages, e.failures, e.skipped)
+        failed_jobs = {job_of(n) for n in e.failures}
+        all_jobs = {job_of(s.name) for s in stages}
+        log(f"❌ Pipeline failed after {time.perf_counter() - t0:.1f}s: "
+            f"{len(failed_jobs)} of {len(all_jobs)} job(s) failed")
+        sys.exit(1)
+    except BaseException as e:
+        log(f"❌ Pipeline failed after {time.perf_counter() - t0:.1f}s: {e}")
+        sys.exit(1)
+
+    report(stages, timings)
+    if args.batch:
+        report_jobs(stages, {}, set())
+    log("✅ Pipeline finished")
+
+
+if __name__ == "__main__":
+    main()
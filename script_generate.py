@@ -5,10 +5,10 @@ import json
 import time
 import hashlib
 import random
+import re
+import threading
 
-from azure.ai.inference import ChatCompletionsClient
-from azure.core.credentials import AzureKeyCredential
-from azure.core.exceptions import HttpResponseError
+import perf_trace
 
 # --------------------------------------------------
 # CONFIG
@@ -19,9 +19,18 @@ ENDPOINT = "https://models.github.ai/inference"
 SCRIPT_FILE = "script.txt"
 IMAGE_PROMPTS_FILE = "image_prompts.json"
 USED_SCRIPTS_FILE = "used_scripts.json"
+METADATA_FILE = "metadata.json"
 
 MAX_RETRIES = 3
 
+# YouTube limits: title <= 100 chars, no angle brackets in title/description
+TITLE_MAX = 100
+TITLE_SUFFIX = " #shorts"
+DEFAULT_PRIVACY = os.getenv("YT_PRIVACY", "public")
+
+# Guards used_scripts.json when several jobs generate scripts concurrently
+_used_lock = threading.Lock()
+
 DOMAINS = [
     "gym discipline and physical transformation",
     "business growth and execution mindset",
@@ -32,17 +41,28 @@ DOMAINS = [
 ]
 
 # --------------------------------------------------
-# ENV
+# CLIENT (created on first use)
 # --------------------------------------------------
-TOKEN = os.getenv("GH_MODELS_TOKEN")
-if not TOKEN:
-    print("❌ GH_MODELS_TOKEN missing", file=sys.stderr)
-    sys.exit(1)
+_client = None
+
+def get_client():
+    global _client
+    if _client is not None:
+        return _client
+
+    token = os.getenv("GH_MODELS_TOKEN")
+    if not token:
+        print("❌ GH_MODELS_TOKEN missing", file=sys.stderr)
+        sys.exit(1)
+
+    from azure.ai.inference import ChatCompletionsClient
+    from azure.core.credentials import AzureKeyCredential
 
-client = ChatCompletionsClient(
-    endpoint=ENDPOINT,
-    credential=AzureKeyCredential(TOKEN),
-)
+    _client = ChatCompletionsClient(
+        endpoint=ENDPOINT,
+        credential=AzureKeyCredential(token),
+    )
+    return _client
 
 # --------------------------------------------------
 # UTIL
@@ -63,16 +83,56 @@ def clean(text: str) -> str:
 def hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
+# --------------------------------------------------
+# METADATA
+# --------------------------------------------------
+def build_title(script: str) -> str:
+    first = re.split(r"(?<=[.!?])\s+", script.strip(), maxsplit=1)[0]
+    first = first.replace("<", "").replace(">", "").rstrip(".!")
+    limit = TITLE_MAX - len(TITLE_SUFFIX)
+    if len(first) > limit:
+        first = first[:limit].rsplit(" ", 1)[0]
+    return first + TITLE_SUFFIX
+
+def build_metadata(script: str, product=None) -> dict:
+    """
+    Upload metadata for youtube_upload.py, derived from the script.
+    """
+    parts = [script.replace("<", "").replace(">", "")]
+    if product and product.get("affiliate_link"):
+        parts.append(f"{product.get('cta', 'Link')}: {product['affiliate_link']}")
+    parts.append("#shorts #motivation #discipline")
+
+    return {
+        "title": build_title(script),
+        "description": "\n\n".join(parts),
+        "tags": ["shorts", "motivation", "discipline", "mindset"],
+        "categoryId": "22",
+        "privacy": DEFAULT_PRIVACY,
+    }
+
 # --------------------------------------------------
 # PROMPT
 # --------------------------------------------------
-def build_prompt(domain: str) -> str:
+def build_product_context(product) -> str:
+    if not product:
+        return ""
+    return f"""
+PRODUCT CONTEXT (do not name the product):
+- Viewer pain: {product.get("pain", "")}
+- Audience: {product.get("audience", "")}
+- Speak directly to that pain and that audience
+- Final line must lead into this call to action: "{product.get("cta", "")}"
+- Write the script in language code: {product.get("language", "en")}
+"""
+
+def build_prompt(domain: str, product=None) -> str:
     return f"""
 You are an elite motivational writer for viral YouTube Shorts.
 
 DOMAIN:
 {domain}
-
+{build_product_context(product)}
 TASK:
 Write a 30–40 second motivational narration.
 
@@ -117,23 +177,37 @@ IMAGES_JSON:
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
-def main():
-    used_hashes = load_used()
+def generate(
+    script_file=SCRIPT_FILE,
+    prompts_file=IMAGE_PROMPTS_FILE,
+    product=None,
+    metadata_file=METADATA_FILE,
+):
+    """
+    Generate a unique script + image prompts, write them (and the upload
+    metadata) to disk and return them as (script, images). `product` is an
+    entry from products.json that steers the script towards its pain,
+    audience and CTA. Raises RuntimeError when every attempt fails.
+    """
+    from azure.core.exceptions import HttpResponseError
+
+    client = get_client()
     domain = random.choice(DOMAINS)
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             print(f"🧠 Generating motivation script ({domain}) — attempt {attempt}")
 
-            response = client.complete(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You write original motivational narration."},
-                    {"role": "user", "content": build_prompt(domain)},
-                ],
-                temperature=0.9,
-                max_tokens=700,
-            )
+            with perf_trace.span("llm.complete", attempt=attempt):
+                response = client.complete(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": "You write original motivational narration."},
+                        {"role": "user", "content": build_prompt(domain, product)},
+                    ],
+                    temperature=0.9,
+                    max_tokens=700,
+                )
 
             text = clean(response.choices[0].message.content)
 
@@ -147,31 +221,41 @@ def main():
             if len(script) < 220:
                 raise ValueError("Script too short")
 
-            script_hash = hash_text(script)
-            if script_hash in used_hashes:
-                raise ValueError("Repeated script detected")
-
             if len(images) < 4:
                 raise ValueError("Not enough image prompts")
 
-            used_hashes.add(script_hash)
-            save_used(used_hashes)
-
-            with open(SCRIPT_FILE, "w", encoding="utf-8") as f:
+            script_hash = hash_text(script)
+            with _used_lock:
+                used_hashes = load_used()
+                if script_hash in used_hashes:
+                    raise ValueError("Repeated script detected")
+                used_hashes.add(script_hash)
+                save_used(used_hashes)
+
+            with open(script_file, "w", encoding="utf-8") as f:
                 f.write(script)
 
-            with open(IMAGE_PROMPTS_FILE, "w", encoding="utf-8") as f:
+            with open(prompts_file, "w", encoding="utf-8") as f:
                 json.dump(images, f, indent=2)
 
+            with open(metadata_file, "w", encoding="utf-8") as f:
+                json.dump(build_metadata(script, product), f, indent=2, ensure_ascii=False)
+
             print("✅ Unique motivational script + image prompts generated")
-            return
+            return script, images
 
         except (HttpResponseError, ValueError, json.JSONDecodeError) as e:
             print(f"⚠️ Retry {attempt}: {e}", file=sys.stderr)
             time.sleep(2)
 
-    print("❌ Failed to generate unique motivational script", file=sys.stderr)
-    sys.exit(1)
+    raise RuntimeError("Failed to generate unique motivational script")
+
+def main():
+    try:
+        generate()
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
 
 # --------------------------------------------------
 if __name__ == "__main__":
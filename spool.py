@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Spool directory that decouples rendering from publishing.
+
+Layout (one directory per video, named by the first 16 hex digits of the
+video's SHA-256):
+
+    spool/
+      incoming/          staging area for enqueue (never read by workers)
+      pending/<id>/      video.mp4 + metadata.json, waiting for upload
+      uploading/<id>/    claimed by a worker (+ video.mp4.upload.json session)
+      done/<id>/         metadata.json + result.json (video removed)
+      failed/<id>/       everything + error.json
+
+Every state transition is a single os.rename() of the entry directory, which
+is atomic on one filesystem: an entry is always in exactly one state, and a
+rename from pending/ doubles as the claim, so two workers never take the same
+entry. An entry left in uploading/ by a crash is moved back to pending/ by
+recover(); its saved upload session lets it resume mid-file, or hands back
+the finished video if the upload completed before the crash. One worker per
+spool directory is enforced with a lock file (worker_lock()).
+
+Dedup: enqueue() skips a video whose id already exists in any state.
+
+Usage:
+    python spool.py enqueue output.mp4 --metadata metadata.json
+    python spool.py status
+    python spool.py retry-failed
+"""
+
+import argparse
+import errno
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX
+    fcntl = None
+
+SPOOL_DIR = os.environ.get("SPOOL_DIR", "spool")
+
+INCOMING = "incoming"
+PENDING = "pending"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+STATES = [PENDING, UPLOADING, DONE, FAILED]
+
+VIDEO_NAME = "video.mp4"
+METADATA_NAME = "metadata.json"
+RESULT_NAME = "result.json"
+ERROR_NAME = "error.json"
+WRITER_NAME = "writer.json"
+SESSION_NAME = VIDEO_NAME + ".upload.json"  # youtube_upload.SESSION_SUFFIX
+LOCK_NAME = ".worker.lock"
+
+# recover() only reaps incoming/ staging dirs whose writer is gone: dead PID
+# on this host, or untouched for this long (writer on another host / no PID)
+INCOMING_STALE_S = float(os.environ.get("SPOOL_INCOMING_STALE_S", "3600"))
+
+
+def log(msg: str) -> None:
+    print(f"[SPOOL] {msg}", flush=True)
+
+
+def state_dir(root: str, state: str) -> str:
+    return os.path.join(root, state)
+
+
+def entry_dir(root: str, state: str, entry_id: str) -> str:
+    return os.path.join(root, state, entry_id)
+
+
+def ensure_layout(root: str = SPOOL_DIR) -> None:
+    for state in [INCOMING] + STATES:
+        os.makedirs(state_dir(root, state), exist_ok=True)
+
+
+def video_id(path: str) -> str:
+    from stage_cache import hash_file
+
+    return hash_file(path)[:16]
+
+
+def find(root: str, entry_id: str) -> Optional[str]:
+    """
+    Return the state holding `entry_id`, or None.
+    """
+    for state in STATES:
+        if os.path.isdir(entry_dir(root, state, entry_id)):
+            return state
+    return None
+
+
+def write_json(path: str, data) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_json(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ------------------------- producer side ------------------------- #
+
+def enqueue(
+    video_path: str,
+    metadata_path: Optional[str] = None,
+    root: str = SPOOL_DIR,
+) -> Optional[str]:
+    """
+    Copy a rendered video (+ metadata) into pending/. Returns the entry id,
+    or None if the same video is already spooled in any state.
+    """
+    ensure_layout(root)
+    entry_id = video_id(video_path)
+
+    existing = find(root, entry_id)
+    if existing:
+        log(f"Skip {video_path}: already spooled as {existing}/{entry_id}")
+        return None
+
+    # Stage under incoming/ so pending/ only ever sees complete entries
+    staging = tempfile.mkdtemp(prefix=f"{entry_id}-", dir=state_dir(root, INCOMING))
+    writer = os.path.join(staging, WRITER_NAME)
+    write_json(writer, {"host": socket.gethostname(), "pid": os.getpid()})
+    shutil.copy2(video_path, os.path.join(staging, VIDEO_NAME))
+
+    metadata = {}
+    if metadata_path and os.path.isfile(metadata_path):
+        metadata = read_json(metadata_path)
+    metadata["spooled_at"] = time.time()
+    write_json(os.path.join(staging, METADATA_NAME), metadata)
+    os.remove(writer)
+
+    try:
+        os.rename(staging, entry_dir(root, PENDING, entry_id))
+    except OSError as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+            raise
+        # Lost a race with a concurrent enqueue of the same video
+        log(f"Skip {video_path}: enqueued concurrently as {entry_id}")
+        return None
+
+    log(f"Enqueued {entry_id} ({metadata.get('title', video_path)})")
+    return entry_id
+
+
+# ------------------------- worker side ------------------------- #
+
+def list_entries(root: str, state: str) -> List[str]:
+    d = state_dir(root, state)
+    if not os.path.isdir(d):
+        return []
+    entries = [e for e in os.listdir(d) if os.path.isdir(os.path.join(d, e))]
+    # Oldest first
+    return sorted(entries, key=lambda e: os.path.getmtime(os.path.join(d, e)))
+
+
+def claim(root: str, entry_id: str) -> Optional[str]:
+    """
+    Move pending/<id> to uploading/<id>. Returns the new path, or None if
+    another worker claimed it first or it was already uploaded (entries can
+    arrive from a spool that never saw the done/ record, e.g. CI artifacts).
+    """
+    if os.path.isdir(entry_dir(root, DONE, entry_id)):
+        shutil.rmtree(entry_dir(root, PENDING, entry_id), ignore_errors=True)
+        log(f"Dropped duplicate {entry_id}: already in done/")
+        return None
+
+    dst = entry_dir(root, UPLOADING, entry_id)
+    try:
+        os.rename(entry_dir(root, PENDING, entry_id), dst)
+    except OSError:
+        return None
+    return dst
+
+
+def prune_done(path: str) -> None:
+    """
+    Drop the video and upload session from a done/ entry; only the
+    metadata and result are kept as the upload record.
+    """
+    for name in (VIDEO_NAME, SESSION_NAME):
+        p = os.path.join(path, name)
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def mark_done(root: str, entry_id: str, result: Dict) -> None:
+    """
+    Record the upload result and move the entry to done/. Each step is safe
+    to crash after: result.json makes recover() finish the move, and the
+    video is only deleted once the entry is in done/.
+    """
+    src = entry_dir(root, UPLOADING, entry_id)
+    dst = entry_dir(root, DONE, entry_id)
+    write_json(os.path.join(src, RESULT_NAME), result)
+    os.rename(src, dst)
+    prune_done(dst)
+
+
+def mark_failed(root: str, entry_id: str, error: str) -> None:
+    src = entry_dir(root, UPLOADING, entry_id)
+    write_json(os.path.join(src, ERROR_NAME), {"error": error, "failed_at": time.time()})
+    os.rename(src, entry_dir(root, FAILED, entry_id))
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+def staging_abandoned(path: str, now: float) -> bool:
+    """
+    True if the enqueue() that created staging dir `path` is no longer
+    running. Producers may be live while a worker starts, so a young dir
+    without a provably dead writer is left alone.
+    """
+    try:
+        writer = read_json(os.path.join(path, WRITER_NAME))
+    except (OSError, ValueError):
+        writer = {}
+    if writer.get("host") == socket.gethostname() and isinstance(writer.get("pid"), int):
+        if not pid_alive(writer["pid"]):
+            return True
+    try:
+        return now - os.path.getmtime(path) > INCOMING_STALE_S
+    except OSError:
+        return False
+
+
+@contextmanager
+def worker_lock(root: str = SPOOL_DIR) -> Iterator[None]:
+    """
+    Hold an exclusive lock on `root` for the life of a worker. recover()
+    assumes nothing else is uploading, so a second worker must not start.
+    """
+    ensure_layout(root)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, LOCK_NAME), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SystemExit(f"[SPOOL] Another worker is already running on {root}")
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def recover(root: str = SPOOL_DIR) -> int:
+    """
+    Return entries stranded in uploading/ by a crashed worker to pending/ and
+    reap abandoned incoming/ staging dirs. Entries that already have
+    result.json were uploaded and go to done/ instead. Call it while
+    holding worker_lock(); producers may keep enqueueing.
+    """
+    n = 0
+    for entry_id in list_entries(root, UPLOADING):
+        src = entry_dir(root, UPLOADING, entry_id)
+        if os.path.exists(os.path.join(src, RESULT_NAME)):
+            os.rename(src, entry_dir(root, DONE, entry_id))
+            log(f"Recovered {entry_id} from uploading/ → done/ (already uploaded)")
+        else:
+            os.rename(src, entry_dir(root, PENDING, entry_id))
+            log(f"Recovered {entry_id} from uploading/")
+        n += 1
+
+    # A crash between the rename to done/ and the cleanup leaves the video
+    for entry_id in list_entries(root, DONE):
+        prune_done(entry_dir(root, DONE, entry_id))
+
+    now = time.time()
+    incoming = state_dir(root, INCOMING)
+    for name in os.listdir(incoming):
+        path = os.path.join(incoming, name)
+        if staging_abandoned(path, now):
+            shutil.rmtree(path, ignore_errors=True)
+            log(f"Removed abandoned staging dir incoming/{name}")
+    return n
+
+
+def retry_failed(root: str = SPOOL_DIR) -> int:
+    n = 0
+    for entry_id in list_entries(root, FAILED):
+        src = entry_dir(root, FAILED, entry_id)
+        err = os.path.join(src, ERROR_NAME)
+        if os.path.exists(err):
+            os.remove(err)
+        os.rename(src, entry_dir(root, PENDING, entry_id))
+        n += 1
+    log(f"Re-queued {n} failed entr{'y' if n == 1 else 'ies'}")
+    return n
+
+
+def status(root: str = SPOOL_DIR) -> Dict[str, int]:
+    return {state: len(list_entries(root, state)) for state in STATES}
+
+
+# ------------------------- CLI ------------------------- #
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Manage the upload spool.")
+    p.add_argument("--dir", default=SPOOL_DIR, help=f"Spool directory (default: $SPOOL_DIR or {SPOOL_DIR}).")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    e = sub.add_parser("enqueue", help="Add a rendered video to pending/.")
+    e.add_argument("video")
+    e.add_argument("--metadata", default="metadata.json", help="Metadata JSON (default: metadata.json).")
+
+    sub.add_parser("status", help="Count entries per state.")
+    sub.add_parser("retry-failed", help="Move failed/ entries back to pending/.")
+
+    args = p.parse_args()
+    ensure_layout(args.dir)
+
+    if args.cmd == "enqueue":
+        enqueue(args.video, args.metadata, args.dir)
+    elif args.cmd == "status":
+        for state, n in status(args.dir).items():
+            log(f"{state:<10} {n}")
+    elif args.cmd == "retry-failed":
+        retry_failed(args.dir)
+
+
+if __name__ == "__main__":
+    main()
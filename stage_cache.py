@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for pipeline stages.
+
+A stage's cache key is the SHA-256 of:
+- the contents of its input files/directories (in declared order),
+- the source of the modules that implement it (the "code version"),
+- its parameters (JSON, sorted keys).
+
+After a stage succeeds its outputs are copied into the cache under that key
+and recorded in manifest.json together with their digests. When the same key
+comes up again the outputs are restored (or left alone if they already match)
+and the stage is skipped, make-style.
+
+The cache is capped in size; least recently used entries are evicted first.
+
+Usage:
+    python stage_cache.py            # list entries
+    python stage_cache.py --clear    # drop everything
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+CACHE_DIR = ".stage_cache"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_MAX_MB = int(os.environ.get("STAGE_CACHE_MAX_MB", "2048"))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHUNK = 1 << 20
+
+
+def log(msg: str) -> None:
+    print(f"[CACHE] {msg}", flush=True)
+
+
+# ------------------------- hashing ------------------------- #
+
+def update_with_file(h, path: str) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    update_with_file(h, path)
+    return h.hexdigest()
+
+
+def hash_path(path: str) -> str:
+    """
+    Digest of a file, or of a directory tree (relative names + contents).
+    Missing paths hash to a fixed marker so they still produce a stable key.
+    """
+    if os.path.isfile(path):
+        return hash_file(path)
+    if not os.path.isdir(path):
+        return "missing"
+
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            h.update(os.path.relpath(full, path).encode("utf-8") + b"\0")
+            update_with_file(h, full)
+    return h.hexdigest()
+
+
+def path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def code_version(modules: Iterable[str]) -> str:
+    h = hashlib.sha256()
+    for module in modules:
+        update_with_file(h, os.path.join(HERE, f"{module}.py"))
+    return h.hexdigest()
+
+
+# ------------------------- file ops ------------------------- #
+
+def copy_path(src: str, dst: str) -> None:
+    """
+    Replace `dst` with a copy of `src` (file or directory).
+    """
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    elif os.path.exists(dst):
+        os.remove(dst)
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        tmp = dst + ".tmp"
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+
+
+def remove_path(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+# ------------------------- cache ------------------------- #
+
+class StageCache:
+    """
+    Thread-safe: the pipeline consults one instance from several stage threads.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_mb: int = DEFAULT_MAX_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    # ---- manifest ---- #
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def _object_dir(self, key: str) -> str:
+        return os.path.join(self.root, "objects", key)
+
+    # ---- public API ---- #
+
+    @staticmethod
+    def key(
+        stage: str,
+        inputs: List[str],
+        code: List[str],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        h = hashlib.sha256()
+        h.update(stage.encode("utf-8") + b"\0")
+        for path in inputs:
+            h.update(hash_path(path).encode("ascii") + b"\0")
+        h.update(code_version(code).encode("ascii") + b"\0")
+        h.update(json.dumps(params or {}, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def restore(self, key: str, outputs: List[str]) -> bool:
+        """
+        Put the cached outputs for `key` in place. Returns False on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or len(entry["digests"]) != len(outputs):
+                return False
+
+            obj = self._object_dir(key)
+            for i, (dst, digest) in enumerate(zip(outputs, entry["digests"])):
+                if hash_path(dst) == digest:
+                    continue
+                src = os.path.join(obj, str(i))
+                if not os.path.exists(src):
+                    # Object lost on disk; treat as a miss and forget it
+                    self.entries.pop(key, None)
+                    self._save()
+                    return False
+                copy_path(src, dst)
+
+            entry["last_used"] = time.time()
+            self._save()
+            return True
+
+    def store(self, key: str, stage: str, outputs: List[str]) -> None:
+        size = sum(path_size(p) for p in outputs if os.path.exists(p))
+        if size > self.max_bytes:
+            log(f"Not caching {stage}: {size / 1e6:.1f} MB exceeds cap")
+            return
+
+        with self.lock:
+            obj = self._object_dir(key)
+            remove_path(obj)
+            digests = []
+            for i, src in enumerate(outputs):
+                if not os.path.exists(src):
+                    log(f"Not caching {stage}: output missing: {src}")
+                    remove_path(obj)
+                    return
+                copy_path(src, os.path.join(obj, str(i)))
+                digests.append(hash_path(src))
+
+            now = time.time()
+            self.entries[key] = {
+                "stage": stage,
+                "outputs": outputs,
+                "digests": digests,
+                "size": size,
+                "created": now,
+                "last_used": now,
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def clear(self) -> None:
+        with self.lock:
+            remove_path(os.path.join(self.root, "objects"))
+            self.entries = {}
+            self._save()
+
+    def total_size(self) -> int:
+        return sum(e["size"] for e in self.entries.values())
+
+    # ---- eviction ---- #
+
+    def _evict(self, keep: str) -> None:
+        total = self.total_size()
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self.entries.pop(key)
+            remove_path(self._object_dir(key))
+            total -= entry["size"]
+            log(f"Evicted {entry['stage']} ({entry['size'] / 1e6:.1f} MB)")
+
+
+# ------------------------- CLI ------------------------- #
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Inspect or clear the stage cache.")
+    p.add_argument("--dir", default=CACHE_DIR, help=f"Cache directory (default: {CACHE_DIR}).")
+    p.add_argument("--clear", action="store_true", help="Remove every cached entry.")
+    args = p.parse_args()
+
+    cache = StageCache(args.dir)
+    if args.clear:
+        cache.clear()
+        log("Cleared")
+        return
+
+    for key, e in sorted(cache.entries.items(), key=lambda kv: kv[1]["last_used"]):
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime(e["last_used"]))
+        log(f"{key[:12]}  {e['stage']:<10} {e['size'] / 1e6:8.1f} MB  last used {used}")
+    log(f"{len(cache.entries)} entries, {cache.total_size() / 1e6:.1f} MB "
+        f"(cap {cache.max_bytes / 1e6:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-import whisper
+import threading
 from datetime import timedelta
 
+import perf_trace
+
 AUDIO_FILE = "final_audio.wav"
 OUT_FILE = "subs.ass"
+MODEL_NAME = "base"
+
+# The Whisper model is loaded once per process and shared (batch mode);
+# transcribe() is not thread-safe, so calls are serialized on the lock.
+_model = None
+_model_lock = threading.Lock()
 
 def format_ass_time(seconds):
     """Converts seconds to ASS format (H:MM:SS.cc)"""
@@ -13,14 +21,29 @@ def format_ass_time(seconds):
     secs = td.total_seconds() % 60
     return f"{hours}:{minutes:02d}:{secs:05.2f}"
 
-def build_subs():
-    # 1. Load the model (base is fast and accurate enough for English)
-    print("[1/3] Loading Whisper model...")
-    model = whisper.load_model("base")
+def load_model():
+    global _model
+    if _model is None:
+        # Imported here: whisper pulls in torch, which dominates startup time
+        import whisper
+
+        # base is fast and accurate enough for English
+        print("[1/3] Loading Whisper model...")
+        with perf_trace.span("whisper.model_load", model=MODEL_NAME):
+            _model = whisper.load_model(MODEL_NAME)
+    return _model
+
+def build_subs(audio_file=AUDIO_FILE, out_file=OUT_FILE, language=None):
+    # 1. Load the model
+    with _model_lock:
+        model = load_model()
 
-    # 2. Transcribe with word-level timestamps
-    print("[2/3] Transcribing audio (this may take a moment)...")
-    result = model.transcribe(AUDIO_FILE, verbose=False, word_timestamps=True)
+        # 2. Transcribe with word-level timestamps
+        print("[2/3] Transcribing audio (this may take a moment)...")
+        with perf_trace.span("whisper.transcribe"):
+            result = model.transcribe(
+                audio_file, verbose=False, word_timestamps=True, language=language
+            )
 
     # 3. Create the ASS Header
     subs = [
@@ -48,10 +71,10 @@ def build_subs():
         subs.append(f"Dialogue: 0,{start},{end},Default,{text}")
 
     # Write to file
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
+    with open(out_file, "w", encoding="utf-8") as f:
         f.write("\n".join(subs))
 
-    print(f"\n[DONE] Precise subtitles saved to {OUT_FILE}")
+    print(f"\n[DONE] Precise subtitles saved to {out_file}")
 
 if __name__ == "__main__":
     build_subs()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The stage scripts live at the repo root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import perf_trace  # noqa: E402
+
+# Test spans (fake server uploads etc.) must never land in real trace files
+perf_trace.configure(None)
@@ -0,0 +1,160 @@
+"""
+Local fake of the YouTube resumable upload protocol, for tests.
+
+    POST /upload/youtube/v3/videos      → 200, Location: <base>/upload/session/<id>
+    PUT  <session>  Content-Range: bytes a-b/N   (chunk)
+                                        → 308 + Range: bytes=0-<last>, or 200 + video
+    PUT  <session>  Content-Range: bytes */N     (status query)
+                                        → same, without storing anything
+
+Faults are queued with fail_next() and consumed by the following PUT
+requests, one per request: an HTTP status (e.g. 503) or "drop" (close the
+socket without answering, after reading part of the body). expire() makes
+every existing session answer 404/410, as when Google forgets an upload.
+"""
+
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+
+RANGE_RE = re.compile(r"bytes (\*|(\d+)-(\d+))/(\d+|\*)")
+
+
+class FakeUploadServer:
+    def __init__(self):
+        self.sessions: Dict[str, bytearray] = {}
+        self.expired: Dict[str, int] = {}
+        self.faults: List[Union[int, str]] = []
+        self.log: List[Dict] = []
+        self.completed: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeUploadServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ---- test controls ----
+
+    def fail_next(self, fault: Union[int, str], times: int = 1, skip: int = 0) -> None:
+        """
+        Queue `fault` for `times` PUT requests, after letting `skip` through.
+        """
+        with self.lock:
+            self.faults.extend([None] * skip + [fault] * times)
+
+    def expire(self, status: int = 404) -> None:
+        with self.lock:
+            for sid in self.sessions:
+                self.expired[sid] = status
+
+    def requests(self, method: Optional[str] = None) -> List[Dict]:
+        with self.lock:
+            return [r for r in self.log if method is None or r["method"] == method]
+
+    def posts(self) -> int:
+        return len(self.requests("POST"))
+
+    def chunk_starts(self) -> List[int]:
+        return [r["start"] for r in self.requests("PUT") if r.get("start") is not None]
+
+    # ---- protocol ----
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _reply(self, status: int, headers: Dict[str, str] = None, body: bytes = b""):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, data, headers: Dict[str, str] = None):
+                h = {"Content-Type": "application/json", **(headers or {})}
+                self._reply(status, h, json.dumps(data).encode())
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                metadata = json.loads(self.rfile.read(length) or b"{}")
+                sid = uuid.uuid4().hex[:12]
+                with server.lock:
+                    server.sessions[sid] = bytearray()
+                    server.log.append({"method": "POST", "session": sid, "metadata": metadata})
+                self._reply(200, {"Location": f"{server.base_url}upload/session/{sid}"})
+
+            def do_PUT(self):
+                sid = self.path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                m = RANGE_RE.match(self.headers.get("Content-Range", ""))
+                start = int(m.group(2)) if m and m.group(2) else None
+                total = int(m.group(4)) if m and m.group(4) != "*" else None
+
+                with server.lock:
+                    fault = server.faults.pop(0) if server.faults else None
+                    server.log.append({"method": "PUT", "session": sid, "start": start, "fault": fault})
+                    expired = server.expired.get(sid)
+                    known = sid in server.sessions
+
+                if fault == "drop":
+                    self.rfile.read(length // 2)
+                    self.close_connection = True
+                    return
+
+                body = self.rfile.read(length)
+                if fault is not None:
+                    return self._json(fault, {"error": {"code": fault, "message": "injected"}})
+                if expired or not known:
+                    status = expired or 404
+                    return self._json(status, {"error": {"code": status, "message": "session gone"}})
+
+                with server.lock:
+                    data = server.sessions[sid]
+                    if start is not None:
+                        # Google keeps what it has and takes the chunk from `start`
+                        del data[start:]
+                        data.extend(body)
+                    received = len(data)
+                    if total is not None and received >= total:
+                        server.completed[sid] = bytes(data)
+                        return self._json(200, {"id": f"fake-{sid}", "kind": "youtube#video"})
+
+                headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+                self._reply(308, headers)
+
+        return Handler
+
+
+def make_service(base_url: str):
+    """
+    youtube v3 service from the bundled discovery doc, pointed at `base_url`.
+    """
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    from googleapiclient.http import build_http
+
+    doc = json.loads(get_static_doc("youtube", "v3"))
+    doc["rootUrl"] = base_url
+    doc["baseUrl"] = base_url + doc["servicePath"]
+    return build_from_document(doc, http=build_http())
@@ -0,0 +1,69 @@
+"""
+audio_mix music-bed reading: stdlib fast path and the pydub fallback.
+"""
+
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+import audio_mix
+
+SR = 44100
+
+
+def write_float_wav(path, x: np.ndarray, sr: int = SR) -> None:
+    """Mono IEEE-float WAV (format 3), which the stdlib `wave` rejects."""
+    data = x.astype("<f4").tobytes()
+    fmt = struct.pack("<HHIIHH", 3, 1, sr, sr * 4, 4, 32)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+        f.write(b"data" + struct.pack("<I", len(data)) + data)
+
+
+def tone(seconds: float = 0.5) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.5 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+
+
+def test_pcm_wav_uses_stdlib_reader(tmp_path, monkeypatch):
+    path = str(tmp_path / "bed.wav")
+    audio_mix.write_wav(path, tone(), SR)
+    monkeypatch.setattr(audio_mix, "read_with_pydub", lambda p: pytest.fail("pydub used"))
+
+    x, sr = audio_mix.read_audio(path)
+
+    assert sr == SR
+    assert np.allclose(x, tone(), atol=1e-4)
+
+
+def test_float_wav_falls_back_to_pydub(tmp_path, monkeypatch):
+    path = str(tmp_path / "bed.wav")
+    write_float_wav(path, tone())
+    calls = []
+
+    def fake_pydub(p):
+        calls.append(p)
+        return tone(), SR
+
+    monkeypatch.setattr(audio_mix, "read_with_pydub", fake_pydub)
+
+    x, sr = audio_mix.read_audio(path)
+
+    assert calls == [path]
+    assert sr == SR and len(x) == len(tone())
+
+
+def test_float_wav_decodes_with_ffmpeg(tmp_path):
+    pytest.importorskip("pydub")
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not installed")
+    path = str(tmp_path / "bed.wav")
+    write_float_wav(path, tone())
+
+    x, sr = audio_mix.read_audio(path)
+
+    assert sr == SR
+    assert np.allclose(x, tone(), atol=1e-3)
@@ -0,0 +1,101 @@
+"""
+run_dag() scheduling and failure isolation, with in-memory stages.
+"""
+
+import os
+
+import pytest
+
+import pipeline
+from pipeline import Stage
+
+
+def ok(value=None):
+    return lambda results: value
+
+
+def fail(results):
+    raise RuntimeError("boom")
+
+
+def test_results_flow_along_dependencies():
+    seen = {}
+
+    def consume(results):
+        seen.update(results)
+
+    stages = [
+        Stage("script", ok("text"), resource="net"),
+        Stage("tts", consume, deps=["script"], resource="xtts"),
+    ]
+    timings = pipeline.run_dag(stages)
+
+    assert seen == {"script": "text"}
+    assert set(timings) == {"script", "tts"}
+
+
+def test_failure_only_skips_dependents_in_its_job():
+    ran = []
+
+    def track(name):
+        def run(results):
+            ran.append(name)
+        return run
+
+    stages = [
+        Stage("a-1/images", fail, resource="net"),
+        Stage("a-1/tts", track("a-1/tts"), resource="xtts"),
+        Stage("a-1/video", track("a-1/video"), deps=["a-1/images", "a-1/tts"]),
+        Stage("a-1/render", track("a-1/render"), deps=["a-1/video"]),
+        Stage("b-1/images", track("b-1/images"), resource="net"),
+        Stage("b-1/video", track("b-1/video"), deps=["b-1/images"]),
+        Stage("b-1/render", track("b-1/render"), deps=["b-1/video"]),
+    ]
+
+    with pytest.raises(pipeline.StageFailures) as exc:
+        pipeline.run_dag(stages)
+
+    assert set(exc.value.failures) == {"a-1/images"}
+    assert exc.value.skipped == {"a-1/video", "a-1/render"}
+    assert sorted(ran) == ["a-1/tts", "b-1/images", "b-1/render", "b-1/video"]
+    assert "b-1/render" in exc.value.timings
+
+
+def test_job_of():
+    assert pipeline.job_of("shoes-2/render") == "shoes-2"
+    assert pipeline.job_of("render") == ""
+
+
+def script_run_id(stages):
+    return next(s for s in stages if s.step == "script").params["run_id"]
+
+
+def test_local_run_id_is_reused_until_the_short_ships(tmp_path):
+    workdir = str(tmp_path / "work")
+
+    first = script_run_id(pipeline.build_stages(workdir))
+    assert script_run_id(pipeline.build_stages(workdir)) == first
+
+    pipeline.clear_run_id(workdir)
+    assert script_run_id(pipeline.build_stages(workdir)) != first
+
+
+def test_explicit_run_id_is_not_saved(tmp_path):
+    workdir = str(tmp_path / "work")
+
+    stages = pipeline.build_stages(workdir, run_id="12345")
+
+    assert script_run_id(stages) == "12345"
+    assert not os.path.exists(os.path.join(workdir, pipeline.RUN_ID_FILE))
+
+
+def test_spool_stage_clears_saved_run_id(tmp_path, monkeypatch):
+    import spool
+
+    workdir = str(tmp_path / "work")
+    stages = pipeline.build_stages(workdir, spool_dir=str(tmp_path / "spool"))
+    monkeypatch.setattr(spool, "enqueue", lambda *args: "entry")
+
+    run_spool = next(s for s in stages if s.step == "spool").func
+    assert run_spool({}) == "entry"
+    assert not os.path.exists(os.path.join(workdir, pipeline.RUN_ID_FILE))
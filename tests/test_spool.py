@@ -0,0 +1,219 @@
+"""
+Spool state transitions and upload_worker.drain() with a stubbed uploader.
+"""
+
+import errno
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import spool
+import upload_worker
+import youtube_upload
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = str(tmp_path / "spool")
+    spool.ensure_layout(path)
+    return path
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "output.mp4"
+    path.write_bytes(os.urandom(4096))
+    return str(path)
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    path = tmp_path / "metadata.json"
+    path.write_text('{"title": "test"}', encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """
+    Stub youtube_upload.upload(); records calls and returns a fake video.
+    """
+    calls = []
+
+    def fake_upload(path, metadata, keep_session=False, **kwargs):
+        calls.append({"path": path, "metadata": metadata, "keep_session": keep_session})
+        return {"id": f"vid{len(calls)}"}
+
+    monkeypatch.setattr(youtube_upload, "upload", fake_upload)
+    return calls
+
+
+def incoming(root):
+    return os.listdir(spool.state_dir(root, spool.INCOMING))
+
+
+def staging_dir(root, name, writer=None, mtime=None):
+    path = os.path.join(spool.state_dir(root, spool.INCOMING), name)
+    os.makedirs(path)
+    if writer is not None:
+        spool.write_json(os.path.join(path, spool.WRITER_NAME), writer)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+# ------------------------- enqueue ------------------------- #
+
+def test_enqueue_stages_complete_entry(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+
+    path = spool.entry_dir(root, spool.PENDING, entry_id)
+    assert sorted(os.listdir(path)) == [spool.METADATA_NAME, spool.VIDEO_NAME]
+    assert spool.read_json(os.path.join(path, spool.METADATA_NAME))["title"] == "test"
+    assert incoming(root) == []
+
+
+def test_enqueue_skips_video_spooled_in_any_state(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+    assert spool.enqueue(video, metadata, root) is None
+
+    spool.claim(root, entry_id)
+    spool.mark_done(root, entry_id, {"video_id": "x"})
+    assert spool.enqueue(video, metadata, root) is None
+    assert spool.status(root) == {"pending": 0, "uploading": 0, "done": 1, "failed": 0}
+
+
+def test_enqueue_reraises_unexpected_rename_errors(root, video, metadata, monkeypatch):
+    def broken_rename(src, dst):
+        raise OSError(errno.EACCES, "denied")
+
+    monkeypatch.setattr(spool.os, "rename", broken_rename)
+    with pytest.raises(OSError):
+        spool.enqueue(video, metadata, root)
+    assert incoming(root) == []
+
+
+# ------------------------- claim / done ------------------------- #
+
+def test_claim_is_exclusive(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+
+    assert spool.claim(root, entry_id) == spool.entry_dir(root, spool.UPLOADING, entry_id)
+    assert spool.claim(root, entry_id) is None
+
+
+def test_claim_drops_entries_already_done(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+    spool.claim(root, entry_id)
+    spool.mark_done(root, entry_id, {"video_id": "x"})
+    # The same entry arrives again in pending/, e.g. from a CI artifact
+    os.makedirs(spool.entry_dir(root, spool.PENDING, entry_id))
+
+    assert spool.claim(root, entry_id) is None
+    assert spool.list_entries(root, spool.PENDING) == []
+
+
+def test_mark_done_keeps_only_the_record(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+    path = spool.claim(root, entry_id)
+    open(os.path.join(path, spool.SESSION_NAME), "w").close()
+
+    spool.mark_done(root, entry_id, {"video_id": "x"})
+
+    done = spool.entry_dir(root, spool.DONE, entry_id)
+    assert sorted(os.listdir(done)) == [spool.METADATA_NAME, spool.RESULT_NAME]
+
+
+# ------------------------- recover ------------------------- #
+
+def test_recover_requeues_unfinished_uploads(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+    spool.claim(root, entry_id)
+
+    assert spool.recover(root) == 1
+    assert spool.list_entries(root, spool.PENDING) == [entry_id]
+
+
+def test_recover_finishes_uploads_that_have_a_result(root, video, metadata):
+    entry_id = spool.enqueue(video, metadata, root)
+    path = spool.claim(root, entry_id)
+    # Crashed after writing result.json, before the rename to done/
+    spool.write_json(os.path.join(path, spool.RESULT_NAME), {"video_id": "x"})
+
+    spool.recover(root)
+
+    assert spool.list_entries(root, spool.PENDING) == []
+    done = spool.entry_dir(root, spool.DONE, entry_id)
+    assert not os.path.exists(os.path.join(done, spool.VIDEO_NAME))
+
+
+def test_recover_reaps_only_abandoned_staging_dirs(root):
+    host = spool.socket.gethostname()
+    staging_dir(root, "live", writer={"host": host, "pid": os.getpid()})
+    staging_dir(root, "young")
+    staging_dir(root, "remote", writer={"host": "elsewhere", "pid": dead_pid()})
+    staging_dir(root, "dead", writer={"host": host, "pid": dead_pid()})
+    staging_dir(root, "old", mtime=time.time() - spool.INCOMING_STALE_S - 60)
+
+    spool.recover(root)
+
+    assert sorted(incoming(root)) == ["live", "remote", "young"]
+
+
+def test_worker_lock_is_exclusive(root):
+    with spool.worker_lock(root):
+        with pytest.raises(SystemExit):
+            with spool.worker_lock(root):
+                pass
+    # Released again afterwards
+    with spool.worker_lock(root):
+        pass
+
+
+# ------------------------- worker ------------------------- #
+
+def test_drain_uploads_pending_entries(root, video, metadata, uploads):
+    entry_id = spool.enqueue(video, metadata, root)
+
+    assert upload_worker.drain(root, concurrency=2) == 0
+
+    assert [c["metadata"]["title"] for c in uploads] == ["test"]
+    assert all(c["keep_session"] for c in uploads)
+    result = spool.read_json(os.path.join(spool.entry_dir(root, spool.DONE, entry_id), spool.RESULT_NAME))
+    assert result["video_id"] == "vid1"
+
+
+def test_drain_marks_corrupt_metadata_failed(root, video, metadata, uploads):
+    entry_id = spool.enqueue(video, metadata, root)
+    path = spool.entry_dir(root, spool.PENDING, entry_id)
+    with open(os.path.join(path, spool.METADATA_NAME), "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    assert upload_worker.drain(root, concurrency=1) == 1
+
+    assert uploads == []
+    failed = spool.entry_dir(root, spool.FAILED, entry_id)
+    assert "JSONDecodeError" in spool.read_json(os.path.join(failed, spool.ERROR_NAME))["error"]
+
+
+def test_drain_marks_upload_errors_failed(root, video, metadata, monkeypatch):
+    def failing_upload(*args, **kwargs):
+        raise SystemExit("[YT] Giving up after 8 retries: HTTP 503")
+
+    monkeypatch.setattr(youtube_upload, "upload", failing_upload)
+    entry_id = spool.enqueue(video, metadata, root)
+
+    assert upload_worker.drain(root, concurrency=1) == 1
+    assert spool.list_entries(root, spool.FAILED) == [entry_id]
+
+    assert spool.retry_failed(root) == 1
+    assert spool.list_entries(root, spool.PENDING) == [entry_id]
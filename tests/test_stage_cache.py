@@ -0,0 +1,150 @@
+"""
+StageCache keys, restore, eviction, and how run_dag() uses it.
+"""
+
+import os
+
+import pytest
+
+import pipeline
+import stage_cache
+from pipeline import Stage
+from stage_cache import StageCache
+
+KB = 1024
+CODE = ["perf_trace"]  # any small module works as a code version
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return StageCache(str(tmp_path / "cache"))
+
+
+def write(path, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ------------------------- keys ------------------------- #
+
+def test_key_is_stable_and_content_addressed(tmp_path):
+    a = write(tmp_path / "a.txt", b"hello")
+    frames = tmp_path / "frames"
+    write(frames / "2.jpg", b"two")
+    write(frames / "1.jpg", b"one")
+
+    key = StageCache.key("tts", [a, str(frames)], CODE, {"x": 1, "y": 2})
+    assert key == StageCache.key("tts", [a, str(frames)], CODE, {"y": 2, "x": 1})
+
+    assert key != StageCache.key("video", [a, str(frames)], CODE, {"x": 1, "y": 2})
+    assert key != StageCache.key("tts", [a, str(frames)], CODE, {"x": 2, "y": 2})
+    assert key != StageCache.key("tts", [a, str(frames)], ["spool"], {"x": 1, "y": 2})
+
+    write(frames / "1.jpg", b"changed")
+    assert key != StageCache.key("tts", [a, str(frames)], CODE, {"x": 1, "y": 2})
+
+
+def test_missing_inputs_still_give_a_key(tmp_path):
+    missing = str(tmp_path / "nope")
+    assert StageCache.key("tts", [missing], CODE) == StageCache.key("tts", [missing], CODE)
+
+
+# ------------------------- store / restore ------------------------- #
+
+def test_restore_copies_outputs_back(cache, tmp_path):
+    out = write(tmp_path / "narration.wav", b"audio")
+    cache.store("k1", "tts", [out])
+    os.remove(out)
+
+    assert cache.restore("k1", [out])
+    assert read(out) == b"audio"
+
+
+def test_restore_leaves_matching_outputs_alone(cache, tmp_path, monkeypatch):
+    out = write(tmp_path / "narration.wav", b"audio")
+    cache.store("k1", "tts", [out])
+    monkeypatch.setattr(stage_cache, "copy_path", lambda src, dst: pytest.fail("copied"))
+
+    assert cache.restore("k1", [out])
+
+
+def test_restore_misses_and_forgets_lost_objects(cache, tmp_path):
+    out = write(tmp_path / "narration.wav", b"audio")
+    cache.store("k1", "tts", [out])
+    os.remove(out)
+    stage_cache.remove_path(cache._object_dir("k1"))
+
+    assert not cache.restore("k1", [out])
+    assert "k1" not in StageCache(cache.root).entries
+
+
+def test_restore_misses_unknown_key(cache, tmp_path):
+    assert not cache.restore("nope", [str(tmp_path / "x")])
+
+
+# ------------------------- eviction ------------------------- #
+
+def test_lru_eviction_under_cap(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_mb=1)
+    outs = [write(tmp_path / f"{i}.bin", b"x" * (400 * KB)) for i in range(3)]
+
+    cache.store("a", "a", [outs[0]])
+    cache.store("b", "b", [outs[1]])
+    # Using "a" makes "b" the least recently used entry
+    assert cache.restore("a", [outs[0]])
+    cache.store("c", "c", [outs[2]])
+
+    assert set(cache.entries) == {"a", "c"}
+    assert not os.path.exists(cache._object_dir("b"))
+    assert cache.total_size() <= cache.max_bytes
+
+
+def test_entry_larger_than_cap_is_not_stored(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_mb=1)
+    out = write(tmp_path / "big.bin", b"x" * (2 * 1024 * KB))
+
+    cache.store("big", "video", [out])
+
+    assert cache.entries == {}
+
+
+# ------------------------- run_dag ------------------------- #
+
+def counting_stage(tmp_path, calls, name="a-1/tts"):
+    out = str(tmp_path / "out.txt")
+
+    def run(results):
+        calls.append(1)
+        write(out, b"result")
+
+    return Stage(name, run, outputs=[out], code=CODE, params={"v": 1})
+
+
+def test_run_dag_skips_cached_stage(cache, tmp_path):
+    calls = []
+    stages = [counting_stage(tmp_path, calls)]
+
+    pipeline.run_dag(stages, cache=cache)
+    timings = pipeline.run_dag(stages, cache=cache)
+
+    assert len(calls) == 1
+    assert timings["a-1/tts"].cached
+
+
+@pytest.mark.parametrize("force", ["tts", "a-1/tts"])
+def test_run_dag_force_reruns_stage(cache, tmp_path, force):
+    calls = []
+    stages = [counting_stage(tmp_path, calls)]
+
+    pipeline.run_dag(stages, cache=cache)
+    timings = pipeline.run_dag(stages, cache=cache, force=[force])
+
+    assert len(calls) == 2
+    assert not timings["a-1/tts"].cached
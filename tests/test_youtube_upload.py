@@ -0,0 +1,139 @@
+"""
+youtube_upload.upload() against the local fake of the resumable protocol.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("httplib2")
+
+from googleapiclient.errors import HttpError  # noqa: E402
+
+import youtube_upload  # noqa: E402
+from fake_upload_server import FakeUploadServer, make_service  # noqa: E402
+
+MB = 1024 * 1024
+METADATA = {**youtube_upload.DEFAULT_METADATA, "title": "test", "privacy": "private"}
+
+
+@pytest.fixture
+def server():
+    srv = FakeUploadServer().start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def backoffs(server, monkeypatch):
+    """
+    Route upload() to the fake server and record backoff attempts
+    instead of sleeping.
+    """
+    calls = []
+
+    def fake_backoff(attempt):
+        calls.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(youtube_upload, "get_service", lambda: make_service(server.base_url))
+    monkeypatch.setattr(youtube_upload, "backoff", fake_backoff)
+    return calls
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "output.mp4"
+    path.write_bytes(os.urandom(3 * MB + MB // 2))
+    return str(path)
+
+
+def upload(video):
+    return youtube_upload.upload(video, dict(METADATA), chunk_mb=1)
+
+
+def session_file(video):
+    return video + youtube_upload.SESSION_SUFFIX
+
+
+def uploaded(server, video):
+    with open(video, "rb") as f:
+        return list(server.completed.values()) == [f.read()]
+
+
+def test_chunked_upload(server, backoffs, video):
+    response = upload(video)
+
+    assert response["id"].startswith("fake-")
+    assert server.chunk_starts() == [0, 1 * MB, 2 * MB, 3 * MB]
+    assert server.requests("POST")[0]["metadata"]["snippet"]["title"] == "test"
+    assert uploaded(server, video)
+    assert backoffs == []
+    assert not os.path.exists(session_file(video))
+
+
+def test_retries_5xx_and_dropped_connections_with_backoff(server, backoffs, video):
+    # Second chunk fails, then the status queries hit a dropped connection
+    # (twice: httplib2 silently retries a disconnect once) and another 5xx
+    server.fail_next(503, skip=1)
+    server.fail_next("drop", times=2)
+    server.fail_next(500)
+
+    upload(video)
+
+    assert backoffs == [1, 2, 3]
+    assert server.posts() == 1
+    assert uploaded(server, video)
+
+
+def test_gives_up_after_max_retries(server, backoffs, video, monkeypatch):
+    monkeypatch.setattr(youtube_upload, "MAX_RETRIES", 2)
+    server.fail_next(503, times=10)
+
+    with pytest.raises(SystemExit):
+        upload(video)
+    assert backoffs == [1, 2]
+
+
+def test_restart_resumes_saved_session_mid_file(server, backoffs, video):
+    # The first process dies after two chunks (non-retriable error)
+    server.fail_next(403, skip=2)
+    with pytest.raises(HttpError):
+        upload(video)
+    assert os.path.exists(session_file(video))
+
+    upload(video)
+
+    assert server.posts() == 1
+    # Second run asks for the offset, then continues from the third chunk
+    assert server.chunk_starts() == [0, 1 * MB, 2 * MB, 2 * MB, 3 * MB]
+    assert uploaded(server, video)
+    assert not os.path.exists(session_file(video))
+
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_expired_session_starts_over(server, backoffs, video, status):
+    server.fail_next(403, skip=2)
+    with pytest.raises(HttpError):
+        upload(video)
+    server.expire(status)
+
+    upload(video)
+
+    assert server.posts() == 2
+    assert server.chunk_starts()[-4:] == [0, 1 * MB, 2 * MB, 3 * MB]
+    assert uploaded(server, video)
+
+
+def test_kept_session_returns_finished_video_without_reupload(server, backoffs, video):
+    # The worker keeps the session until the spool entry reaches done/
+    first = youtube_upload.upload(video, dict(METADATA), chunk_mb=1, keep_session=True)
+    assert os.path.exists(session_file(video))
+
+    # Crash before the result was recorded: the retry must not upload twice
+    second = youtube_upload.upload(video, dict(METADATA), chunk_mb=1, keep_session=True)
+
+    assert second["id"] == first["id"]
+    assert server.posts() == 1
+    assert server.chunk_starts() == [0, 1 * MB, 2 * MB, 3 * MB]
@@ -26,12 +26,15 @@ import random
 import re
 import sys
 import tempfile
-from typing import List, Optional
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import torch
-from TTS.api import TTS
-from pydub import AudioSegment, effects
-from pydub.effects import compress_dynamic_range
+import perf_trace
+
+# torch, TTS and pydub are heavy; they are imported inside the functions that
+# need them so `--help` and `import tts_generate` stay fast.
+if TYPE_CHECKING:
+    from pydub import AudioSegment
 
 
 VOICES_DIR = "voices"
@@ -49,6 +52,8 @@ def log(msg: str) -> None:
 # ------------------------- device ------------------------- #
 
 def detect_device() -> str:
+    import torch
+
     if torch.cuda.is_available():
         return "cuda"
     # GitHub Actions typically has only CPU
@@ -146,10 +151,13 @@ def split_text_into_chunks(text: str, max_words: int = 45) -> List[str]:
 
 # ------------------------- audio helpers ------------------------- #
 
-def normalize_audio(seg: AudioSegment) -> AudioSegment:
+def normalize_audio(seg: "AudioSegment") -> "AudioSegment":
     """
     Loudness normalization + gentle compression + standard format.
     """
+    from pydub import effects
+    from pydub.effects import compress_dynamic_range
+
     seg = effects.normalize(seg)
     seg = compress_dynamic_range(
         seg,
@@ -163,13 +171,15 @@ def normalize_audio(seg: AudioSegment) -> AudioSegment:
 
 
 def join_chunks_with_crossfade(
-    pieces: List[AudioSegment],
+    pieces: List["AudioSegment"],
     pause_ms: int = 160,
     crossfade_ms: int = 20,
-) -> AudioSegment:
+) -> "AudioSegment":
     """
     Join chunks with tiny pauses and crossfade to avoid clicks/pops.
     """
+    from pydub import AudioSegment
+
     if not pieces:
         return AudioSegment.empty()
 
@@ -183,6 +193,28 @@ def join_chunks_with_crossfade(
     return out
 
 
+# ------------------------- model cache ------------------------- #
+
+# One XTTS instance per (model, device) shared by every synthesis in the
+# process, so batch runs pay the multi-second load once. XTTS inference is
+# not thread-safe, so each model carries a lock held around every call.
+_models: Dict[Tuple[str, str], Tuple[Any, threading.Lock]] = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model_name: str, device: str) -> Tuple[Any, threading.Lock]:
+    with _models_lock:
+        key = (model_name, device)
+        if key not in _models:
+            from TTS.api import TTS
+
+            log(f"Loading XTTS model: {model_name} on {device}")
+            with perf_trace.span("tts.model_load", model=model_name, device=device):
+                tts = TTS(model_name=model_name, progress_bar=False).to(device)
+            _models[key] = (tts, threading.Lock())
+        return _models[key]
+
+
 # ------------------------- core synthesis ------------------------- #
 
 def synthesize_xtts(
@@ -191,14 +223,16 @@ def synthesize_xtts(
     ref_voice: str,
     text: str,
     output_path: str,
+    language: str = "en",
 ) -> None:
-    log(f"Loading XTTS model: {model_name} on {device}")
-    tts = TTS(model_name=model_name, progress_bar=False).to(device)
+    from pydub import AudioSegment
+
+    tts, tts_lock = load_model(model_name, device)
 
     chunks = split_text_into_chunks(text, max_words=45)
     log(f"Script split into {len(chunks)} chunks")
 
-    pieces: List[AudioSegment] = []
+    pieces: List["AudioSegment"] = []
 
     with tempfile.TemporaryDirectory() as tmpdir:
         for i, chunk in enumerate(chunks, start=1):
@@ -208,12 +242,13 @@ def synthesize_xtts(
             tmp_wav = os.path.join(tmpdir, f"chunk_{i}.wav")
 
             # Core XTTS voice cloning call
-            tts.tts_to_file(
-                text=chunk,
-                speaker_wav=ref_voice,
-                language="en",
-                file_path=tmp_wav,
-            )
+            with tts_lock, perf_trace.span("tts.chunk", index=i, words=chunk_wc):
+                tts.tts_to_file(
+                    text=chunk,
+                    speaker_wav=ref_voice,
+                    language=language,
+                    file_path=tmp_wav,
+                )
 
             if not os.path.exists(tmp_wav) or os.path.getsize(tmp_wav) == 0:
                 log(f"ERROR: XTTS produced empty audio for chunk {i}")
@@ -226,22 +261,43 @@ def synthesize_xtts(
         log("ERROR: No audio chunks were produced.")
         sys.exit(1)
 
-    log("Joining chunks with crossfade + pauses...")
-    joined = join_chunks_with_crossfade(pieces, pause_ms=160, crossfade_ms=20)
+    with perf_trace.span("tts.postprocess"):
+        log("Joining chunks with crossfade + pauses...")
+        joined = join_chunks_with_crossfade(pieces, pause_ms=160, crossfade_ms=20)
 
-    log("Normalizing + compressing audio...")
-    final = normalize_audio(joined)
+        log("Normalizing + compressing audio...")
+        final = normalize_audio(joined)
 
-    # Atomic write to avoid broken files
-    tmp_out = output_path + ".tmp"
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    final.export(tmp_out, format="wav")
-    os.replace(tmp_out, output_path)
+        # Atomic write to avoid broken files
+        tmp_out = output_path + ".tmp"
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        final.export(tmp_out, format="wav")
+        os.replace(tmp_out, output_path)
 
     total_sec = len(final) / 1000.0
     log(f"Done. Wrote {output_path} ({total_sec:.1f}s)")
 
 
+def synthesize(
+    text: str,
+    output_path: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    language: str = "en",
+) -> None:
+    """
+    Library entry point: pick a device and reference voice, then synthesize
+    `text` to `output_path`. The model is loaded once per process.
+    """
+    synthesize_xtts(
+        model_name=model_name,
+        device=detect_device(),
+        ref_voice=pick_reference_voice(),
+        text=text,
+        output_path=output_path,
+        language=language,
+    )
+
+
 # ------------------------- CLI ------------------------- #
 
 def parse_args() -> argparse.Namespace:
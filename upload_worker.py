@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Drain the upload spool (see spool.py) with bounded concurrency.
+
+On start, entries left in uploading/ by a crashed worker go back to
+pending/. Each pending entry is claimed by an atomic rename, uploaded with
+youtube_upload.upload() (resumable; the session file lives inside the entry
+so a retry resumes mid-file) and moved to done/ or failed/.
+
+Only one worker runs per spool directory (a lock file on the spool root);
+a second one exits at start.
+
+Usage:
+    python upload_worker.py                     # drain until pending/ is empty
+    python upload_worker.py --concurrency 2
+    python upload_worker.py --watch --poll 30   # keep draining as renders land
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import spool
+
+
+def log(msg: str) -> None:
+    print(f"[WORKER] {msg}", flush=True)
+
+
+def upload_entry(root: str, entry_id: str) -> bool:
+    """
+    Upload one claimed entry and record the outcome. Returns True on success.
+    """
+    import youtube_upload
+
+    path = spool.entry_dir(root, spool.UPLOADING, entry_id)
+    video = os.path.join(path, spool.VIDEO_NAME)
+
+    try:
+        metadata = youtube_upload.load_metadata(os.path.join(path, spool.METADATA_NAME))
+        # The session stays until the entry reaches done/, so a crash before
+        # that resumes into the finished upload instead of a second copy
+        response = youtube_upload.upload(video, metadata, keep_session=True)
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            # Leave it in uploading/; recover() re-queues it next start
+            raise
+        spool.mark_failed(root, entry_id, repr(e))
+        log(f"✖ {entry_id}: {e!r}")
+        return False
+
+    spool.mark_done(root, entry_id, {
+        "video_id": response.get("id"),
+        "uploaded_at": time.time(),
+    })
+    log(f"✔ {entry_id} → https://youtube.com/shorts/{response.get('id')}")
+    return True
+
+
+def drain(root: str, concurrency: int, watch: bool = False, poll: float = 30.0) -> int:
+    """
+    Upload pending entries, at most `concurrency` at once. Returns the number
+    of failures.
+    """
+    failures = 0
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="upload") as pool:
+        while True:
+            for entry_id in spool.list_entries(root, spool.PENDING):
+                if len(running) >= concurrency:
+                    break
+                if spool.claim(root, entry_id) is None:
+                    continue
+                log(f"▶ {entry_id}")
+                running[pool.submit(upload_entry, root, entry_id)] = entry_id
+
+            if running:
+                done, _ = wait(running, timeout=poll if watch else None,
+                               return_when=FIRST_COMPLETED)
+                for fut in done:
+                    running.pop(fut)
+                    if not fut.result():
+                        failures += 1
+                continue
+
+            if not watch:
+                return failures
+            time.sleep(poll)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Upload videos from the spool directory.")
+    p.add_argument("--dir", default=spool.SPOOL_DIR, help=f"Spool directory (default: {spool.SPOOL_DIR}).")
+    p.add_argument("--concurrency", type=int, default=2, help="Parallel uploads (default: 2).")
+    p.add_argument("--watch", action="store_true", help="Keep polling for new entries.")
+    p.add_argument("--poll", type=float, default=30.0, help="Poll interval in seconds (default: 30).")
+    args = p.parse_args()
+
+    with spool.worker_lock(args.dir):
+        spool.recover(args.dir)
+        failures = drain(args.dir, args.concurrency, args.watch, args.poll)
+
+    counts = spool.status(args.dir)
+    log(", ".join(f"{state}: {n}" for state, n in counts.items()))
+    if failures:
+        log(f"❌ {failures} upload(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
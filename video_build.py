@@ -1,16 +1,14 @@
 #!/usr/bin/env python3
 import os
 import sys
-from typing import List
+from typing import TYPE_CHECKING, List
 
-from moviepy.editor import (
-    ImageClip,
-    concatenate_videoclips,
-    AudioFileClip,
-    CompositeAudioClip,
-    vfx
-)
-from pydub import AudioSegment
+import perf_trace
+
+# moviepy.editor imports numpy, imageio and probes ffmpeg at import time, so it
+# is only loaded by the functions that render.
+if TYPE_CHECKING:
+    from moviepy.editor import ImageClip
 
 # ---------------- CONFIG ----------------
 OUTPUT_VIDEO = "video_raw.mp4"
@@ -30,28 +28,32 @@ def log(msg: str):
     print(f"[VID] {msg}", flush=True)
 
 
-def get_audio_path() -> str:
-    if os.path.isfile(PRIMARY_AUDIO):
-        return PRIMARY_AUDIO
-    if os.path.isfile(FALLBACK_AUDIO):
+def get_audio_path(workdir: str = ".") -> str:
+    primary = os.path.join(workdir, PRIMARY_AUDIO)
+    fallback = os.path.join(workdir, FALLBACK_AUDIO)
+    if os.path.isfile(primary):
+        return primary
+    if os.path.isfile(fallback):
         log("⚠️ final_audio.wav missing — using narration.wav")
-        return FALLBACK_AUDIO
+        return fallback
     raise SystemExit("[VID] No audio file found")
 
 
 def get_audio_duration(path: str) -> float:
+    from pydub import AudioSegment
+
     audio = AudioSegment.from_file(path)
     duration = len(audio) / 1000.0
     return min(duration, MAX_DURATION)
 
 
-def list_frames() -> List[str]:
-    if not os.path.isdir(FRAMES_DIR):
+def list_frames(frames_dir: str = FRAMES_DIR) -> List[str]:
+    if not os.path.isdir(frames_dir):
         raise SystemExit("[VID] frames/ directory missing")
 
     frames = sorted(
-        os.path.join(FRAMES_DIR, f)
-        for f in os.listdir(FRAMES_DIR)
+        os.path.join(frames_dir, f)
+        for f in os.listdir(frames_dir)
         if f.lower().endswith((".jpg", ".jpeg", ".png"))
     )
 
@@ -60,7 +62,9 @@ def list_frames() -> List[str]:
     return frames
 
 
-def prepare_clip(img_path: str, duration: float, index: int) -> ImageClip:
+def prepare_clip(img_path: str, duration: float, index: int) -> "ImageClip":
+    from moviepy.editor import ImageClip, vfx
+
     clip = ImageClip(img_path).set_duration(duration)
 
     # Single resize
@@ -85,52 +89,75 @@ def prepare_clip(img_path: str, duration: float, index: int) -> ImageClip:
     return clip
 
 
-def main():
-    audio_path = get_audio_path()
+def build_video(
+    audio_path: str,
+    frames_dir: str = FRAMES_DIR,
+    output_path: str = OUTPUT_VIDEO,
+) -> None:
+    from moviepy.editor import (
+        concatenate_videoclips,
+        AudioFileClip,
+    )
+
     total_duration = get_audio_duration(audio_path)
-    frames = list_frames()
+    frames = list_frames(frames_dir)
 
     per_frame = total_duration / len(frames)
     log(f"Audio duration: {total_duration:.2f}s | Frames: {len(frames)}")
 
-    clips = [
-        prepare_clip(img, per_frame, i)
-        for i, img in enumerate(frames)
-    ]
+    with perf_trace.span("video.prepare", frames=len(frames)):
+        clips = [
+            prepare_clip(img, per_frame, i)
+            for i, img in enumerate(frames)
+        ]
 
     video = concatenate_videoclips(clips, method="compose")
     video = video.set_duration(total_duration)
 
-    voice = AudioFileClip(audio_path).subclip(0, total_duration)
-    video = video.set_audio(CompositeAudioClip([voice]))
+    # Music is already mixed into final_audio.wav by audio_mix.py, so the
+    # track is attached as-is instead of going through CompositeAudioClip
+    audio = AudioFileClip(audio_path).subclip(0, total_duration)
+    video = video.set_audio(audio)
 
     log("Rendering 1080p Shorts master")
 
-    video.write_videofile(
-        OUTPUT_VIDEO,
-        fps=FPS,
-        codec="libx264",
-        audio_codec="aac",
-        preset="slow",
-        threads=4,
-        ffmpeg_params=[
-            "-crf", "16",
-            "-vf",
-            "scale=1080:1920:flags=lanczos,"
-            "unsharp=5:5:0.8:3:3:0.4",
-            "-pix_fmt", "yuv420p",
-            "-profile:v", "high",
-            "-level", "4.2",
-            "-movflags", "+faststart",
-            "-color_primaries", "bt709",
-            "-color_trc", "bt709",
-            "-colorspace", "bt709",
-        ],
-        logger=None,
-    )
+    # moviepy puts its temp audio in the CWD, named after the output's
+    # basename; every batch job writes video_raw.mp4, so keep it per job
+    out_dir = os.path.dirname(output_path) or "."
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    temp_audio = os.path.join(out_dir, f"{stem}.TEMP_MPY_wvf_snd.m4a")
+
+    with perf_trace.span("video.encode"):
+        video.write_videofile(
+            output_path,
+            temp_audiofile=temp_audio,
+            fps=FPS,
+            codec="libx264",
+            audio_codec="aac",
+            preset="slow",
+            threads=4,
+            ffmpeg_params=[
+                "-crf", "16",
+                "-vf",
+                "scale=1080:1920:flags=lanczos,"
+                "unsharp=5:5:0.8:3:3:0.4",
+                "-pix_fmt", "yuv420p",
+                "-profile:v", "high",
+                "-level", "4.2",
+                "-movflags", "+faststart",
+                "-color_primaries", "bt709",
+                "-color_trc", "bt709",
+                "-colorspace", "bt709",
+            ],
+            logger=None,
+        )
 
     log("Done — clean audio, max quality")
 
 
+def main():
+    build_video(get_audio_path())
+
+
 if __name__ == "__main__":
     main()
@@ -1,28 +1,294 @@
+#!/usr/bin/env python3
+"""
+Resumable YouTube uploader.
+
+- Uploads in chunks (--chunk-mb / $YT_UPLOAD_CHUNK_MB, default 8 MB).
+- Retries 5xx responses and connection errors with exponential backoff
+  and jitter; each retry resumes from the last byte the server confirmed.
+- Persists the upload session URI next to the video (<video>.upload.json),
+  so a restarted process resumes mid-file instead of starting over.
+- Takes title, description, tags and privacy from metadata.json written by
+  script_generate.py.
+"""
+
+import argparse
+import json
 import os
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from googleapiclient.http import MediaFileUpload
-
-creds = Credentials(
-    None,
-    refresh_token=os.environ["YT_REFRESH_TOKEN"],
-    token_uri="https://oauth2.googleapis.com/token",
-    client_id=os.environ["YT_CLIENT_ID"],
-    client_secret=os.environ["YT_CLIENT_SECRET"],
-    scopes=["https://www.googleapis.com/auth/youtube.upload"],
-)
-
-youtube = build("youtube", "v3", credentials=creds)
-
-youtube.videos().insert(
-    part="snippet,status",
-    body={
-        "snippet": {
-            "title": "Quiet work beats loud dreams",
-            "description": "Build silently.\n\nLink below.",
-            "categoryId": "22"
-        },
-        "status": {"privacyStatus": "public"}
-    },
-    media_body=MediaFileUpload("output.mp4")
-).execute()
+import random
+import time
+
+import perf_trace
+
+VIDEO_FILE = "output.mp4"
+METADATA_FILE = "metadata.json"
+SESSION_SUFFIX = ".upload.json"
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+
+CHUNK_MB = int(os.environ.get("YT_UPLOAD_CHUNK_MB", "8"))
+MAX_RETRIES = 8
+MAX_BACKOFF = 64.0
+RETRIABLE_STATUS = {500, 502, 503, 504}
+# The resumable session is gone (expired or never existed): start over
+SESSION_GONE_STATUS = {404, 410}
+
+# Used when metadata.json is missing, e.g. for a manual upload
+DEFAULT_METADATA = {
+    "title": "Quiet work beats loud dreams",
+    "description": "Build silently.\n\nLink below.",
+    "categoryId": "22",
+    "privacy": "public",
+}
+
+
+def log(msg: str) -> None:
+    print(f"[YT] {msg}", flush=True)
+
+
+# ------------------------- auth ------------------------- #
+
+def get_credentials():
+    from google.oauth2.credentials import Credentials
+
+    return Credentials(
+        None,
+        refresh_token=os.environ["YT_REFRESH_TOKEN"],
+        token_uri=TOKEN_URI,
+        client_id=os.environ["YT_CLIENT_ID"],
+        client_secret=os.environ["YT_CLIENT_SECRET"],
+        scopes=SCOPES,
+    )
+
+
+def get_service():
+    from googleapiclient.discovery import build
+
+    return build("youtube", "v3", credentials=get_credentials())
+
+
+# ------------------------- metadata ------------------------- #
+
+def load_metadata(path: str = METADATA_FILE) -> dict:
+    if not os.path.isfile(path):
+        log(f"⚠️ {path} missing — using default title/description")
+        return dict(DEFAULT_METADATA)
+    with open(path, "r", encoding="utf-8") as f:
+        return {**DEFAULT_METADATA, **json.load(f)}
+
+
+def build_body(metadata: dict) -> dict:
+    snippet = {
+        "title": metadata["title"],
+        "description": metadata["description"],
+        "categoryId": metadata["categoryId"],
+    }
+    if metadata.get("tags"):
+        snippet["tags"] = metadata["tags"]
+    return {
+        "snippet": snippet,
+        "status": {"privacyStatus": metadata["privacy"]},
+    }
+
+
+# ------------------------- session ------------------------- #
+
+def file_fingerprint(path: str) -> dict:
+    from stage_cache import hash_file
+
+    return {"size": os.path.getsize(path), "sha256": hash_file(path)}
+
+
+def load_session(session_file: str, fingerprint: dict):
+    """
+    Return the saved resumable URI if it belongs to this exact file.
+    """
+    try:
+        with open(session_file, "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if session.get("fingerprint") != fingerprint:
+        return None
+    return session.get("uri")
+
+
+def save_session(session_file: str, uri: str, fingerprint: dict) -> None:
+    tmp = session_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"uri": uri, "fingerprint": fingerprint, "created": time.time()}, f)
+    os.replace(tmp, session_file)
+
+
+def clear_session(session_file: str) -> None:
+    if os.path.exists(session_file):
+        os.remove(session_file)
+
+
+# ------------------------- upload ------------------------- #
+
+def retriable_errors():
+    import http.client
+
+    import httplib2
+
+    return (
+        httplib2.HttpLib2Error,
+        OSError,  # socket errors, ConnectionError, TimeoutError
+        http.client.NotConnected,
+        http.client.IncompleteRead,
+        http.client.ImproperConnectionState,
+        http.client.CannotSendRequest,
+        http.client.CannotSendHeader,
+        http.client.ResponseNotReady,
+        http.client.BadStatusLine,
+    )
+
+
+def backoff(attempt: int) -> float:
+    return min(MAX_BACKOFF, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def upload(
+    path: str = VIDEO_FILE,
+    metadata: dict = None,
+    chunk_mb: int = CHUNK_MB,
+    session_file: str = None,
+    keep_session: bool = False,
+) -> dict:
+    """
+    Upload `path` and return the inserted video resource.
+
+    With `keep_session` the session file survives a successful upload, so a
+    caller that crashes before recording the result gets the finished video
+    back from the session on the next call instead of uploading it again.
+    """
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+
+    if not os.path.isfile(path):
+        raise SystemExit(f"[YT] Video not found: {path}")
+
+    metadata = metadata or load_metadata()
+    session_file = session_file or path + SESSION_SUFFIX
+    size = os.path.getsize(path)
+    fingerprint = file_fingerprint(path)
+    errors = retriable_errors()
+    youtube = get_service()
+
+    def new_request():
+        media = MediaFileUpload(
+            path,
+            mimetype="video/mp4",
+            chunksize=chunk_mb * 1024 * 1024,
+            resumable=True,
+        )
+        return youtube.videos().insert(
+            part="snippet,status",
+            body=build_body(metadata),
+            media_body=media,
+        )
+
+    request = new_request()
+    session_uri = load_session(session_file, fingerprint)
+    resumed = session_uri is not None
+    if resumed:
+        log("Resuming saved upload session")
+        request.resumable_uri = session_uri
+        # Makes next_chunk() first ask the server how many bytes it already has
+        request._in_error_state = True
+
+    log(f"Uploading {path} ({size / 1e6:.1f} MB) as {metadata['privacy']}: {metadata['title']}")
+
+    response = None
+    attempt = 0
+    # Throughput counts only bytes sent by this process
+    start_bytes = None if resumed else 0
+    t0 = time.perf_counter()
+
+    with perf_trace.span("youtube.upload", bytes=size, resumed=resumed):
+        while response is None:
+            error = None
+            try:
+                with perf_trace.span("youtube.chunk"):
+                    status, response = request.next_chunk()
+                attempt = 0
+
+                if request.resumable_uri and request.resumable_uri != session_uri:
+                    session_uri = request.resumable_uri
+                    save_session(session_file, session_uri, fingerprint)
+
+                if status is not None:
+                    done = status.resumable_progress
+                    if start_bytes is None:
+                        start_bytes = done
+                    elapsed = time.perf_counter() - t0
+                    rate = (done - start_bytes) / elapsed / 1e6 if elapsed > 0 else 0.0
+                    log(
+                        f"{100.0 * done / size:5.1f}% "
+                        f"({done / 1e6:.1f}/{size / 1e6:.1f} MB) {rate:.2f} MB/s"
+                    )
+
+            except HttpError as e:
+                code = e.resp.status
+                if code in SESSION_GONE_STATUS and session_uri:
+                    log(f"Upload session expired (HTTP {code}) — starting over")
+                    clear_session(session_file)
+                    request, session_uri, start_bytes = new_request(), None, 0
+                    continue
+                if code not in RETRIABLE_STATUS:
+                    raise
+                error = f"HTTP {code}"
+            except errors as e:
+                error = repr(e)
+
+            if error is not None:
+                attempt += 1
+                if attempt > MAX_RETRIES:
+                    raise SystemExit(f"[YT] Giving up after {MAX_RETRIES} retries: {error}")
+                delay = backoff(attempt)
+                log(f"⚠️ {error} — retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+
+    if not keep_session:
+        clear_session(session_file)
+    elapsed = time.perf_counter() - t0
+    log(f"✅ Uploaded video id {response.get('id')} in {elapsed:.1f}s "
+        f"({size / 1e6 / max(elapsed, 1e-9):.2f} MB/s)")
+    return response
+
+
+# ------------------------- CLI ------------------------- #
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Resumable YouTube Shorts uploader.")
+    p.add_argument("--file", default=VIDEO_FILE, help=f"Video to upload (default: {VIDEO_FILE}).")
+    p.add_argument(
+        "--metadata",
+        default=METADATA_FILE,
+        help=f"Metadata JSON from script_generate.py (default: {METADATA_FILE}).",
+    )
+    p.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=CHUNK_MB,
+        help=f"Upload chunk size in MB (default: $YT_UPLOAD_CHUNK_MB or {CHUNK_MB}).",
+    )
+    p.add_argument(
+        "--privacy",
+        choices=["public", "unlisted", "private"],
+        default=None,
+        help="Override the privacy status from the metadata.",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    metadata = load_metadata(args.metadata)
+    if args.privacy:
+        metadata["privacy"] = args.privacy
+    upload(args.file, metadata, chunk_mb=args.chunk_mb)
+
+
+if __name__ == "__main__":
+    main()